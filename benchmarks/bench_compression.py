@@ -0,0 +1,85 @@
+"""Benchmark: pre-compressed cached catalog pages vs compressing on every request.
+
+Serializes synthetic product pages the way get_products does, stores them in
+a VersionedCache and reports the bytes sent per encoding, the one-off cost of
+compressing a page when it is cached, and the per-hit cost of serving it
+compared with gzip-per-request middleware. Run from the repository root:
+
+    python -m benchmarks.bench_compression [--limits 20 50 100] [--hits 2000] [--json]
+"""
+import argparse
+import gzip
+import json
+import statistics
+import sys
+import time
+
+from starlette.requests import Request
+
+from benchmarks.bench_serialization import make_products
+from utils.cache import VersionedCache, cached_response
+from utils.serialization import dumps
+
+
+def make_request(accept_encoding: str) -> Request:
+    headers = [(b"accept-encoding", accept_encoding.encode())] if accept_encoding else []
+    return Request({"type": "http", "method": "GET", "path": "/products/products", "headers": headers})
+
+
+def per_hit_us(fn, hits: int) -> float:
+    started = time.perf_counter()
+    for _ in range(hits):
+        fn()
+    return (time.perf_counter() - started) / hits * 1e6
+
+
+def run(args):
+    results = []
+    for limit in args.limits:
+        body = dumps(make_products(limit))
+        cache = VersionedCache(maxsize=16, ttl=300)
+        store_ms = []
+        for attempt in range(5):
+            started = time.perf_counter()
+            entry = cache.store("products", attempt, 0, body)
+            store_ms.append((time.perf_counter() - started) * 1000)
+
+        requests = {name: make_request(header) for name, header in (
+            ("identity", ""), ("gzip", "gzip, deflate"), ("br", "gzip, deflate, br")
+        )}
+        row = {
+            "limit": limit,
+            "raw_bytes": len(body),
+            **{f"{enc}_bytes": len(data) for enc, data in entry.encodings.items()},
+            **{f"{enc}_ratio": round(len(body) / len(data), 1) for enc, data in entry.encodings.items()},
+            "compress_once_ms": round(statistics.median(store_ms), 2),
+        }
+        for name, request in requests.items():
+            row[f"hit_{name}_us"] = round(per_hit_us(lambda: cached_response(request, entry), args.hits), 1)
+        row["gzip_per_request_us"] = round(
+            per_hit_us(lambda: gzip.compress(body, compresslevel=6), max(args.hits // 10, 1)), 1
+        )
+        results.append(row)
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--limits", type=int, nargs="+", default=[20, 50, 100])
+    parser.add_argument("--hits", type=int, default=2000)
+    parser.add_argument("--json", action="store_true", help="print machine-readable results")
+    args = parser.parse_args()
+
+    results = run(args)
+    if args.json:
+        json.dump(results, sys.stdout, indent=2)
+        print()
+        return
+    for row in results:
+        print(f"--- page of {row['limit']} products")
+        for key, value in row.items():
+            print(f"{key:>22}: {value}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,89 @@
+"""Benchmark: raw phone-photo uploads vs resized WebP/JPEG variants.
+
+Synthesizes camera-sized JPEGs (with EXIF), runs them through the same
+decode/resize/encode step the upload path uses, and reports processing time,
+bytes sent to Cloudinary and the bytes a storefront page downloads. Run from
+the repository root:
+
+    python -m benchmarks.bench_images [--images 4] [--width 4032 --height 3024] [--json]
+"""
+import argparse
+import io
+import json
+import random
+import statistics
+import sys
+import time
+
+from PIL import Image, ImageDraw, ImageFilter
+
+from utils.images import IMAGE_FORMATS, IMAGE_VARIANTS, _render_variants
+
+
+def make_photo(width: int, height: int, seed: int) -> bytes:
+    """A noisy, detailed image that compresses roughly like a real photo."""
+    rng = random.Random(seed)
+    image = Image.new("RGB", (width, height))
+    draw = ImageDraw.Draw(image)
+    for _ in range(400):
+        x, y = rng.randrange(width), rng.randrange(height)
+        r = rng.randrange(20, width // 6)
+        draw.ellipse((x - r, y - r, x + r, y + r), fill=tuple(rng.randrange(256) for _ in range(3)))
+    image = image.filter(ImageFilter.GaussianBlur(2))
+    # Sensor noise is what makes camera JPEGs large
+    noise = Image.effect_noise((width, height), 24).convert("RGB")
+    image = Image.blend(image, noise, 0.25)
+    exif = Image.Exif()
+    exif[0x010F] = "Phone Maker"  # Make
+    exif[0x0112] = 6  # Orientation: rotate 90
+    buffer = io.BytesIO()
+    image.save(buffer, "JPEG", quality=95, exif=exif)
+    return buffer.getvalue()
+
+
+def run(args):
+    photos = [make_photo(args.width, args.height, seed) for seed in range(args.images)]
+    timings, uploaded, card_webp, full_jpeg = [], [], [], []
+    for data in photos:
+        started = time.perf_counter()
+        result = _render_variants(data)
+        timings.append(time.perf_counter() - started)
+        variants = result["variants"]
+        uploaded.append(sum(len(v[fmt]) for v in variants.values() for fmt in IMAGE_FORMATS))
+        card_webp.append(len(variants["card"]["webp"]))
+        full_jpeg.append(len(variants["full"]["jpeg"]))
+
+    original = statistics.mean(len(p) for p in photos)
+    return {
+        "images": args.images,
+        "source": f"{args.width}x{args.height}",
+        "variants": IMAGE_VARIANTS,
+        "process_ms_mean": round(statistics.mean(timings) * 1000, 1),
+        "original_bytes": round(original),
+        "uploaded_bytes_all_variants": round(statistics.mean(uploaded)),
+        "upload_reduction": round(original / statistics.mean(uploaded), 1),
+        "listing_page_bytes_card_webp": round(statistics.mean(card_webp)),
+        "listing_page_reduction": round(original / statistics.mean(card_webp), 1),
+        "detail_page_bytes_full_jpeg": round(statistics.mean(full_jpeg)),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--images", type=int, default=4)
+    parser.add_argument("--width", type=int, default=4032)
+    parser.add_argument("--height", type=int, default=3024)
+    parser.add_argument("--json", action="store_true", help="print machine-readable results")
+    args = parser.parse_args()
+
+    results = run(args)
+    if args.json:
+        json.dump(results, sys.stdout, indent=2)
+        print()
+        return
+    for key, value in results.items():
+        print(f"{key:>30}: {value}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,133 @@
+"""Benchmark: current list-endpoint serialization vs the orjson fast path.
+
+Builds synthetic Motor-shaped documents (ObjectId `_id`, datetimes) and times
+both paths for the bodies of get_products, get_all_orders and
+get_customer_orders. Run from the repository root:
+
+    python -m benchmarks.bench_serialization [--docs 10000] [--repeat 5] [--json]
+"""
+import argparse
+import json
+import random
+import statistics
+import sys
+import time
+from datetime import datetime, timedelta
+from typing import List
+
+from bson import ObjectId
+from fastapi.encoders import jsonable_encoder
+from pydantic import TypeAdapter
+
+from models.orders import Order
+from utils.serialization import dumps
+
+
+def make_products(n):
+    return [
+        {
+            "_id": ObjectId(),
+            "name": f"Product {i}",
+            "description": "Lorem ipsum dolor sit amet " * 4,
+            "price": round(random.uniform(10, 5000), 2),
+            "quantity": random.randint(0, 500),
+            "images": [f"https://res.cloudinary.com/demo/image/upload/p{i}-{j}.jpg" for j in range(3)],
+            "category": random.choice(["Apparel", "Kitchen", "Office"]),
+            "brand": random.choice(["Acme", "Hydra", "Nimbus"]),
+            "created_at": datetime.utcnow().isoformat(),
+            "updated_at": datetime.utcnow().isoformat(),
+        }
+        for i in range(n)
+    ]
+
+
+def make_orders(n, customers=1):
+    start = datetime(2024, 1, 1)
+    return [
+        {
+            "_id": ObjectId(),
+            "order_id": f"ORD-{i:06d}",
+            "customer_id": f"C{i % customers:07d}",
+            "items": [
+                {"product_id": str(ObjectId()), "name": f"Item {j}", "price": 99.5, "quantity": j + 1}
+                for j in range(3)
+            ],
+            "total_price": 597.0,
+            "status": "pending",
+            "created_at": start + timedelta(minutes=i),
+            "updated_at": None,
+        }
+        for i in range(n)
+    ]
+
+
+def starlette_render(content) -> bytes:
+    """What JSONResponse does after FastAPI has prepared the content."""
+    return json.dumps(content, ensure_ascii=False, allow_nan=False, separators=(",", ":")).encode()
+
+
+orders_adapter = TypeAdapter(List[Order])
+
+
+def current_products(docs):
+    products = [{**product, "_id": str(product["_id"])} for product in docs]
+    return starlette_render(jsonable_encoder(products))
+
+
+def current_orders(docs):
+    rows = [{**order, "_id": str(order["_id"]), "order_id": order["order_id"]} for order in docs]
+    validated = orders_adapter.validate_python(rows)  # response_model validation
+    return starlette_render(orders_adapter.dump_python(validated, mode="json"))
+
+
+def fast_path(docs):
+    return dumps(docs)
+
+
+def best_ms(func, docs, repeat):
+    timings = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        func(docs)
+        timings.append((time.perf_counter() - started) * 1000)
+    return min(timings), statistics.median(timings)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--docs", type=int, default=10_000)
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--json", action="store_true", help="print machine-readable results")
+    args = parser.parse_args()
+
+    cases = [
+        ("get_products", make_products(args.docs), current_products),
+        ("get_all_orders", make_orders(args.docs, customers=500), current_orders),
+        ("get_customer_orders", make_orders(args.docs), current_orders),
+    ]
+
+    results = []
+    for name, docs, current in cases:
+        current_best, current_median = best_ms(current, docs, args.repeat)
+        fast_best, fast_median = best_ms(fast_path, docs, args.repeat)
+        results.append({
+            "endpoint": name,
+            "docs": args.docs,
+            "current_ms": round(current_best, 2),
+            "fast_ms": round(fast_best, 2),
+            "current_median_ms": round(current_median, 2),
+            "fast_median_ms": round(fast_median, 2),
+            "speedup": round(current_best / fast_best, 1),
+        })
+
+    if args.json:
+        print(json.dumps(results, indent=2))
+    else:
+        print(f"{'endpoint':<22}{'current ms':>12}{'fast ms':>10}{'speedup':>10}")
+        for r in results:
+            print(f"{r['endpoint']:<22}{r['current_ms']:>12.2f}{r['fast_ms']:>10.2f}{r['speedup']:>9.1f}x")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,518 @@
+"""Offline load test and latency baseline for every router in main.app.
+
+Boots the app in-process (ASGI, no network) against a throwaway MongoDB
+database, seeds synthetic data, then drives each route with concurrent
+clients and reports throughput and p50/p95/p99 latency as JSON.
+
+    # Local mongod; uses (and drops) the "loadtest" database
+    python -m benchmarks.loadtest --mongo-uri mongodb://localhost:27017 --products 100000
+
+    # No MongoDB at all: mongomock-motor as an in-process stand-in
+    python -m benchmarks.loadtest --in-process --products 10000
+
+    # Compare against a stored baseline and fail on p95 regressions
+    python -m benchmarks.loadtest --output current.json --compare baseline.json
+
+Every operation in the OpenAPI schema has a scenario; a full run warns about
+any route added without one. With --in-process, routes relying on features
+mongomock lacks (transactions for checkout, $mergeObjects for cart updates)
+report errors instead of latencies; use a replica set for those.
+
+Cloudinary is always stubbed, with a configurable fake upload latency.
+Install the extra packages (httpx, mongomock-motor and the driver versions
+mongomock works with) first:
+
+    pip install -r benchmarks/requirements.txt
+"""
+import argparse
+import asyncio
+import io
+import json
+import os
+import platform
+import random
+import re
+import sys
+import time
+from datetime import datetime, timedelta
+from typing import Any, Callable, Dict, List, Optional
+
+SEED_BATCH = 5_000
+LOADTEST_PASSWORD = "loadtest-password"
+CATEGORIES = ["Apparel", "Kitchen", "Office", "Garden", "Toys", "Books"]
+BRANDS = ["Acme", "Hydra", "Nimbus", "Orion", "Vega"]
+WORDS = ["red", "blue", "cotton", "steel", "classic", "eco", "mini", "pro", "smart", "soft"]
+
+
+# ------------------------------
+# Environment
+# ------------------------------
+
+def prepare_environment(args):
+    """Point the app at an isolated database and stub external services before importing it."""
+    os.environ["MONGO_URI"] = args.mongo_uri
+    os.environ["MONGO_DB_NAME"] = args.db_name
+    os.environ.setdefault("OWNER_EMAIL", "owner@example.com")
+    os.environ.setdefault("OWNER_PASSWORD", "owner-password")
+    # Every simulated user shares one client address and would be rate limited together
+    os.environ.setdefault("ADMISSION_CONTROL", "0")
+
+    if args.in_process:
+        import motor.motor_asyncio
+        from mongomock_motor import AsyncMongoMockClient
+
+        motor.motor_asyncio.AsyncIOMotorClient = lambda *a, **k: AsyncMongoMockClient()
+        # mongomock has no GridFS, which the background media queue stores uploads in
+        os.environ.setdefault("MEDIA_QUEUE", "0")
+
+    import cloudinary.uploader
+
+    def fake_upload(file, public_id=None, **kwargs):
+        time.sleep(args.upload_latency)
+        return {"secure_url": f"https://res.cloudinary.com/loadtest/{public_id}.jpg", "public_id": public_id}
+
+    cloudinary.uploader.upload = fake_upload
+    cloudinary.uploader.destroy = lambda public_id, **kwargs: {"result": "ok"}
+
+
+# ------------------------------
+# Seeding
+# ------------------------------
+
+async def insert_batched(collection, docs):
+    batch = []
+    for doc in docs:
+        batch.append(doc)
+        if len(batch) >= SEED_BATCH:
+            await collection.insert_many(batch, ordered=False)
+            batch = []
+    if batch:
+        await collection.insert_many(batch, ordered=False)
+
+
+async def seed(args) -> Dict[str, Any]:
+    from bson import ObjectId
+    from config import db
+    from utils.hashing import hash_password
+
+    if not args.db_name.startswith("loadtest"):
+        raise SystemExit("Refusing to drop a database whose name does not start with 'loadtest'")
+    await db.get_client().drop_database(args.db_name)
+
+    now = datetime.utcnow()
+    # Routes that consume what they touch (delete, checkout, clear, retry) get one seeded
+    # document per call, so every timed request does real work rather than hitting a 404
+    per_call = args.requests + args.warmup
+    product_ids = [ObjectId() for _ in range(args.products + per_call)]
+    await insert_batched(db.products_collection, (
+        {
+            "_id": product_id,
+            "name": " ".join(random.sample(WORDS, 3)) + f" {i}",
+            "description": " ".join(random.choices(WORDS, k=12)),
+            "price": round(random.uniform(50, 20000), 2),
+            "quantity": random.randint(1_000, 100_000),
+            "images": [f"https://res.cloudinary.com/loadtest/p{i}.jpg"],
+            "category": random.choice(CATEGORIES),
+            "brand": random.choice(BRANDS),
+            "created_at": (now - timedelta(seconds=i)).isoformat(),
+            "updated_at": now.isoformat(),
+        }
+        for i, product_id in enumerate(product_ids)
+    ))
+    category_ids = [ObjectId() for _ in range(len(CATEGORIES) + per_call)]
+    category_names = CATEGORIES + [f"Disposable {i}" for i in range(per_call)]
+    await insert_batched(db.categories_collection, (
+        {
+            "_id": category_id,
+            "name": name,
+            "description": f"{name} products",
+            "created_at": now.isoformat(),
+            "updated_at": now.isoformat(),
+        }
+        for category_id, name in zip(category_ids, category_names)
+    ))
+
+    # One real bcrypt hash shared by every customer keeps seeding fast
+    password_hash = await hash_password(LOADTEST_PASSWORD)
+    emails = [f"customer{i}@example.com" for i in range(args.customers)]
+    await insert_batched(db.customers_collection, (
+        {"name": f"Customer {i}", "email": email, "customer_id": f"LT{i:06d}", "password": password_hash}
+        for i, email in enumerate(emails)
+    ))
+
+    catalog_ids = product_ids[:args.products]
+    cart_owners = [ObjectId() for _ in range(args.customers)]
+    checkout_owners = [ObjectId() for _ in range(per_call)]
+    clear_owners = [ObjectId() for _ in range(per_call)]
+    cart_items = {owner: random.sample(catalog_ids, min(3, len(catalog_ids))) for owner in cart_owners}
+    await insert_batched(db.cart_collection, (
+        {
+            "customer_id": owner,
+            "items": [
+                {"_id": None, "product_id": str(product_id), "name": "seeded", "price": 100.0, "quantity": 1}
+                for product_id in cart_items.get(owner) or random.sample(catalog_ids, min(3, len(catalog_ids)))
+            ],
+            "total_price": 300.0,
+            "created_at": now.isoformat(),
+            "updated_at": now.isoformat(),
+        }
+        for owner in cart_owners + checkout_owners + clear_owners
+    ))
+
+    order_customers = [str(owner) for owner in cart_owners]
+    await insert_batched(db.orders_collection, (
+        {
+            "order_id": f"ORD-LT{i:07d}",
+            "customer_id": random.choice(order_customers),
+            "items": [{"product_id": str(random.choice(catalog_ids)), "name": "seeded", "price": 100.0, "quantity": 2}],
+            "total_price": 200.0,
+            "status": random.choice(["pending", "shipped", "delivered", "cancelled"]),
+            "created_at": now - timedelta(minutes=i),
+        }
+        for i in range(args.orders)
+    ))
+    # Rollups for /orders/analytics, as if every seeded order had been recorded
+    from utils.sales_rollups import rebuild_rollups
+    try:
+        await rebuild_rollups()
+    except Exception as e:  # mongomock has no $unionWith; analytics then reads empty rollups
+        print(f"ℹ️ Could not build sales rollups: {e}", file=sys.stderr)
+
+    job_ids = [ObjectId() for _ in range(per_call)]
+    await insert_batched(db.media_jobs_collection, (
+        {
+            "_id": job_id,
+            "target": "products",
+            "target_id": product_ids[0],
+            "folder": "loadtest",
+            "files": [],
+            "status": "failed",
+            "attempts": 5,
+            "run_at": now,
+            "last_error": "seeded",
+            "created_at": now,
+            "updated_at": now,
+        }
+        for job_id in job_ids
+    ))
+    import_job = await db.import_jobs_collection.insert_one(
+        {"status": "completed", "format": "csv", "processed": 0, "failed": 0, "errors": [], "created_at": now}
+    )
+
+    return {
+        "product_ids": [str(p) for p in catalog_ids],
+        "disposable_products": [str(p) for p in product_ids[args.products:]],
+        "category_ids": [str(c) for c in category_ids[:len(CATEGORIES)]],
+        "disposable_categories": [str(c) for c in category_ids[len(CATEGORIES):]],
+        "emails": emails,
+        "cart_owners": [str(owner) for owner in cart_owners],
+        "cart_items": {str(owner): [str(p) for p in items] for owner, items in cart_items.items()},
+        "checkout_owners": [str(owner) for owner in checkout_owners],
+        "clear_owners": [str(owner) for owner in clear_owners],
+        "order_customers": order_customers,
+        "order_ids": [f"ORD-LT{i:07d}" for i in range(args.orders)],
+        "media_jobs": [str(job_id) for job_id in job_ids],
+        "retry_jobs": [str(job_id) for job_id in job_ids],
+        "import_job": str(import_job.inserted_id),
+        "since": (now - timedelta(days=1)).isoformat(),
+    }
+
+
+# ------------------------------
+# Scenarios
+# ------------------------------
+
+def scenarios(data: Dict[str, Any]) -> Dict[str, Callable[[int], Dict[str, Any]]]:
+    """Route name -> function building the httpx request kwargs for call number n."""
+    from PIL import Image
+
+    buffer = io.BytesIO()
+    Image.new("RGB", (64, 64), (200, 120, 40)).save(buffer, "JPEG")
+    tiny_image = buffer.getvalue()
+
+    def take(key: str) -> str:
+        """Next seeded document for a route that consumes one per call."""
+        items = data.get(key) or []
+        return items.pop() if items else "0" * 24  # Exhausted: the route answers 404
+
+    def cart_line(n):
+        owner = random.choice(data["cart_owners"])
+        return owner, random.choice(data["cart_items"][owner])
+
+    def import_csv(n) -> bytes:
+        rows = [f"LT-{n}-{i},Imported {i},{10 + i},{i}" for i in range(20)]
+        return ("sku,name,price,quantity\n" + "\n".join(rows) + "\n").encode()
+
+    return {
+        # Customer Authentication
+        "customer-auth.login": lambda n: {
+            "method": "POST", "url": "/customer-auth/login",
+            "json": {"email": random.choice(data["emails"]), "password": LOADTEST_PASSWORD},
+        },
+        "customer-auth.register": lambda n: {
+            "method": "POST", "url": "/customer-auth/register",
+            "json": {"name": "New", "email": f"new{n}-{random.getrandbits(32)}@example.com", "password": "pw"},
+        },
+        # Owner Authentication
+        "owner-auth.login": lambda n: {
+            "method": "POST", "url": "/owner-auth/login",
+            "json": {"email": os.environ["OWNER_EMAIL"], "password": os.environ["OWNER_PASSWORD"]},
+        },
+        # Product Management
+        "products.list": lambda n: {"method": "GET", "url": "/products/products", "params": {"limit": 50}},
+        "products.list.filtered": lambda n: {
+            "method": "GET", "url": "/products/products",
+            "params": {"limit": 50, "category": random.choice(CATEGORIES), "fields": "name,price"},
+        },
+        "products.search": lambda n: {
+            "method": "GET", "url": "/products/search", "params": {"q": random.choice(WORDS)[:3]},
+        },
+        "products.create": lambda n: {
+            "method": "POST", "url": "/products/products",
+            "data": {"name": f"Load {n}", "price": "10", "quantity": "5", "category": "Toys", "brand": "Acme"},
+            "files": [("images", (f"{n}-{i}.jpg", tiny_image, "image/jpeg")) for i in range(3)],
+        },
+        "products.update": lambda n: {
+            "method": "PUT", "url": f"/products/products/{random.choice(data['product_ids'])}",
+            "json": {"price": round(random.uniform(50, 20000), 2)},
+        },
+        "products.delete": lambda n: {"method": "DELETE", "url": f"/products/products/{take('disposable_products')}"},
+        "products.import": lambda n: {
+            "method": "POST", "url": "/products/products/import",
+            "files": [("file", (f"import-{n}.csv", import_csv(n), "text/csv"))],
+        },
+        "products.import.status": lambda n: {
+            "method": "GET", "url": f"/products/products/import/{data['import_job']}",
+        },
+        # Cart Management
+        "cart.get": lambda n: {"method": "GET", "url": f"/cart/cart/{random.choice(data['cart_owners'])}"},
+        "cart.add": lambda n: {
+            "method": "POST", "url": f"/cart/cart/{random.choice(data['cart_owners'])}/add",
+            "json": {"product_id": random.choice(data["product_ids"]), "name": "x", "price": 10.0, "quantity": 1},
+        },
+        "cart.update": lambda n: (lambda owner, product: {
+            "method": "PUT", "url": f"/cart/cart/{owner}/update/{product}", "params": {"quantity": random.randint(1, 5)},
+        })(*cart_line(n)),
+        "cart.remove": lambda n: (lambda owner, product: {
+            "method": "DELETE", "url": f"/cart/cart/{owner}/remove/{product}",
+        })(*cart_line(n)),
+        "cart.clear": lambda n: {"method": "DELETE", "url": f"/cart/cart/{take('clear_owners')}/clear"},
+        # Orders
+        "orders.create": lambda n: {
+            "method": "POST", "url": "/orders/",
+            "json": {
+                "customer_id": random.choice(data["order_customers"]),
+                "items": [{"product_id": random.choice(data["product_ids"]), "name": "x", "price": 10.0, "quantity": 1}],
+                "total_price": 10.0,
+            },
+        },
+        "orders.checkout": lambda n: {"method": "POST", "url": f"/orders/checkout/{take('checkout_owners')}"},
+        "orders.list": lambda n: {"method": "GET", "url": "/orders/"},
+        "orders.customer": lambda n: {
+            "method": "GET", "url": f"/orders/customer/{random.choice(data['order_customers'])}",
+        },
+        "orders.customer.history": lambda n: {
+            "method": "GET", "url": f"/orders/customer/{random.choice(data['order_customers'])}/history",
+        },
+        "orders.detail": lambda n: {"method": "GET", "url": f"/orders/detail/{random.choice(data['order_ids'])}"},
+        "orders.analytics": lambda n: {"method": "GET", "url": "/orders/analytics", "params": {"interval": "week"}},
+        "orders.status": lambda n: {
+            "method": "PATCH", "url": f"/orders/{random.choice(data['order_ids'])}",
+            "params": {"status": random.choice(["pending", "shipped", "delivered"])},
+        },
+        "orders.bulk_status": lambda n: {
+            "method": "PATCH", "url": "/orders/bulk/status",
+            "json": {"status": "cancelled", "order_ids": random.sample(data["order_ids"], min(20, len(data["order_ids"])))},
+        },
+        "orders.export": lambda n: {
+            "method": "GET", "url": "/orders/export",
+            "params": {"status": "pending", "start": data["since"], "format": "ndjson"},
+        },
+        # Category Management
+        "category.list": lambda n: {"method": "GET", "url": "/category/categories"},
+        "category.create": lambda n: {
+            "method": "POST", "url": "/category/categories",
+            "data": {"name": f"Load {n}-{random.getrandbits(32)}", "description": "load test"},
+        },
+        "category.update": lambda n: {
+            "method": "PUT", "url": f"/category/categories/{random.choice(data['category_ids'])}",
+            "data": {"description": f"updated {n}"},
+        },
+        "category.delete": lambda n: {
+            "method": "DELETE", "url": f"/category/categories/{take('disposable_categories')}",
+        },
+        # Media Jobs
+        "media.job": lambda n: {"method": "GET", "url": f"/media/jobs/{random.choice(data['media_jobs'])}"},
+        "media.retry": lambda n: {"method": "POST", "url": f"/media/jobs/{take('retry_jobs')}/retry"},
+        # Monitoring
+        "metrics": lambda n: {"method": "GET", "url": "/metrics"},
+        "root": lambda n: {"method": "GET", "url": "/"},
+    }
+
+
+def uncovered_routes(app, sent: List[Dict[str, Any]]) -> List[str]:
+    """Operations in the app's OpenAPI schema that none of the sent requests matched."""
+    hit = {(kwargs["method"].upper(), kwargs["url"].split("?")[0]) for kwargs in sent}
+    missing = []
+    for path, operations in app.openapi()["paths"].items():
+        pattern = re.compile("^" + re.sub(r"\{[^/]+\}", "[^/]+", path) + "$")
+        for method in operations:
+            if not any(m == method.upper() and pattern.match(url) for m, url in hit):
+                missing.append(f"{method.upper()} {path}")
+    return missing
+
+
+def percentile(sorted_values: List[float], pct: float) -> float:
+    if not sorted_values:
+        return 0.0
+    index = max(0, min(len(sorted_values) - 1, round(pct / 100 * len(sorted_values) + 0.5) - 1))
+    return sorted_values[index]
+
+
+async def run_route(client, build, requests: int, concurrency: int) -> Dict[str, Any]:
+    latencies: List[float] = []
+    errors: Dict[str, int] = {}
+    counter = iter(range(requests))
+
+    async def worker():
+        for n in counter:
+            kwargs = build(n)
+            started = time.perf_counter()
+            try:
+                response = await client.request(**kwargs)
+                await response.aread()
+                if response.status_code >= 400:
+                    errors[str(response.status_code)] = errors.get(str(response.status_code), 0) + 1
+            except Exception as e:
+                errors[type(e).__name__] = errors.get(type(e).__name__, 0) + 1
+            latencies.append((time.perf_counter() - started) * 1000)
+
+    started = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    elapsed = time.perf_counter() - started
+
+    latencies.sort()
+    return {
+        "requests": len(latencies),
+        "errors": errors,
+        "throughput_rps": round(len(latencies) / elapsed, 1) if elapsed else 0.0,
+        "p50_ms": round(percentile(latencies, 50), 3),
+        "p95_ms": round(percentile(latencies, 95), 3),
+        "p99_ms": round(percentile(latencies, 99), 3),
+        "max_ms": round(latencies[-1], 3) if latencies else 0.0,
+    }
+
+
+def compare(results: Dict[str, Any], baseline_path: str, threshold: float) -> List[str]:
+    with open(baseline_path) as f:
+        baseline = json.load(f)["routes"]
+    regressions = []
+    for name, current in results["routes"].items():
+        previous = baseline.get(name)
+        if previous and previous["p95_ms"] and current["p95_ms"] > previous["p95_ms"] * threshold:
+            regressions.append(f"{name}: p95 {previous['p95_ms']}ms -> {current['p95_ms']}ms")
+    return regressions
+
+
+async def main_async(args) -> int:
+    prepare_environment(args)
+
+    import httpx
+    import main
+
+    routes = scenarios({})  # Names only, for validation
+    selected = args.routes.split(",") if args.routes else list(routes)
+    unknown = sorted(set(selected) - set(routes))
+    if unknown:
+        raise SystemExit(f"Unknown routes: {', '.join(unknown)}")
+
+    async with main.app.router.lifespan_context(main.app):
+        seed_started = time.perf_counter()
+        data = await seed(args)
+        seed_seconds = time.perf_counter() - seed_started
+
+        # Rebuild the in-memory search index now that the catalog exists
+        from config.db import products_collection
+        from utils.search import build_search_index
+        await build_search_index(products_collection)
+
+        routes = scenarios(data)
+        results: Dict[str, Any] = {
+            "meta": {
+                "timestamp": datetime.utcnow().isoformat(),
+                "python": platform.python_version(),
+                "mongo": "mongomock-motor" if args.in_process else args.mongo_uri.split("@")[-1],
+                "products": args.products,
+                "customers": args.customers,
+                "orders": args.orders,
+                "requests_per_route": args.requests,
+                "concurrency": args.concurrency,
+                "seed_seconds": round(seed_seconds, 2),
+            },
+            "routes": {},
+        }
+
+        sent = []
+        transport = httpx.ASGITransport(app=main.app)
+        async with httpx.AsyncClient(transport=transport, base_url="https://loadtest") as client:
+            for name in selected:
+                for n in range(min(args.warmup, args.requests)):
+                    kwargs = routes[name](n)
+                    sent.append(kwargs)
+                    try:
+                        await client.request(**kwargs)
+                    except Exception:
+                        pass  # Counted when the timed run hits it too
+                results["routes"][name] = await run_route(client, routes[name], args.requests, args.concurrency)
+                r = results["routes"][name]
+                print(
+                    f"{name:<26} {r['throughput_rps']:>9.1f} rps  p50 {r['p50_ms']:>8.2f}  "
+                    f"p95 {r['p95_ms']:>8.2f}  p99 {r['p99_ms']:>8.2f} ms  errors {sum(r['errors'].values())}",
+                    file=sys.stderr,
+                )
+
+    if not args.routes:
+        # A new route without a scenario would silently escape regression checks
+        for route in uncovered_routes(main.app, sent):
+            print(f"⚠️ No load test scenario for {route}", file=sys.stderr)
+
+    output = json.dumps(results, indent=2)
+    if args.output:
+        with open(args.output, "w") as f:
+            f.write(output)
+    else:
+        print(output)
+
+    if args.compare:
+        regressions = compare(results, args.compare, args.threshold)
+        for regression in regressions:
+            print(f"REGRESSION {regression}", file=sys.stderr)
+        return 1 if regressions else 0
+    return 0
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Load test every router of the e-commerce API")
+    parser.add_argument("--mongo-uri", default=os.getenv("LOADTEST_MONGO_URI", "mongodb://localhost:27017"))
+    parser.add_argument("--db-name", default="loadtest", help="dropped and re-seeded; must start with 'loadtest'")
+    parser.add_argument("--in-process", action="store_true", help="use mongomock-motor instead of a real mongod")
+    parser.add_argument("--products", type=int, default=10_000)
+    parser.add_argument("--customers", type=int, default=1_000)
+    parser.add_argument("--orders", type=int, default=10_000)
+    parser.add_argument("--requests", type=int, default=500, help="timed requests per route")
+    parser.add_argument("--warmup", type=int, default=20, help="untimed requests per route")
+    parser.add_argument("--concurrency", type=int, default=16)
+    parser.add_argument("--routes", help="comma-separated subset of route names")
+    parser.add_argument("--upload-latency", type=float, default=0.05, help="seconds per stubbed Cloudinary upload")
+    parser.add_argument("--seed", type=int, default=1234, help="random seed for reproducible data")
+    parser.add_argument("--output", help="write the JSON baseline here instead of stdout")
+    parser.add_argument("--compare", help="baseline JSON to compare p95 latencies against")
+    parser.add_argument("--threshold", type=float, default=1.25, help="allowed p95 growth factor")
+    args = parser.parse_args()
+
+    random.seed(args.seed)
+    sys.exit(asyncio.run(main_async(args)))
+
+
+if __name__ == "__main__":
+    main()
@@ -1,31 +1,156 @@
 import os
+from typing import Any, Dict, Optional
 from dotenv import load_dotenv
-from motor.motor_asyncio import AsyncIOMotorClient
+from motor.motor_asyncio import AsyncIOMotorClient, AsyncIOMotorDatabase
+from pymongo import ReadPreference
+from pymongo.read_concern import ReadConcern
+from utils.metrics import mongo_command_listener, mongo_pool_listener
 
 # Load environment variables
 load_dotenv()
 
 MONGO_URI = os.getenv("MONGO_URI")
-DB_NAME = "temp"  # Explicitly set the database name
+DB_NAME = os.getenv("MONGO_DB_NAME", "temp")  # Explicitly set the database name (overridable for load tests)
 
 if not MONGO_URI:
     raise ValueError("MONGO_URI is not set in .env file")
 
-# Initialize MongoDB client (but don't connect immediately)
-client = AsyncIOMotorClient(MONGO_URI)
-database = client[DB_NAME]  # Connect to the 'ph' database
+# ------------------------------
+# Client Settings (from .env)
+# ------------------------------
+
+CLIENT_SETTINGS: Dict[str, Any] = {
+    "maxPoolSize": int(os.getenv("MONGO_MAX_POOL_SIZE", "100")),
+    "minPoolSize": int(os.getenv("MONGO_MIN_POOL_SIZE", "0")),
+    "maxIdleTimeMS": int(os.getenv("MONGO_MAX_IDLE_TIME_MS", "300000")),
+    "serverSelectionTimeoutMS": int(os.getenv("MONGO_SERVER_SELECTION_TIMEOUT_MS", "5000")),
+    "connectTimeoutMS": int(os.getenv("MONGO_CONNECT_TIMEOUT_MS", "5000")),
+    "socketTimeoutMS": int(os.getenv("MONGO_SOCKET_TIMEOUT_MS", "30000")),
+    # Compressors whose library is not installed are skipped by the driver
+    "compressors": os.getenv("MONGO_COMPRESSORS", "zstd,snappy,zlib"),
+}
+
+# Read routing per collection. Uncached catalog reads (NDJSON streams, search
+# index builds) tolerate replication lag and may go to secondaries; anything
+# stored in catalog_cache reads the primary handles below, so a body cached
+# after an invalidation never predates the write. Carts and orders stay on the primary.
+CATALOG_READ_PREFERENCE = os.getenv("MONGO_CATALOG_READ_PREFERENCE", "secondaryPreferred")
+CATALOG_READ_CONCERN = os.getenv("MONGO_CATALOG_READ_CONCERN", "local")
+
+_READ_PREFERENCES = {
+    "primary": ReadPreference.PRIMARY,
+    "primaryPreferred": ReadPreference.PRIMARY_PREFERRED,
+    "secondary": ReadPreference.SECONDARY,
+    "secondaryPreferred": ReadPreference.SECONDARY_PREFERRED,
+    "nearest": ReadPreference.NEAREST,
+}
+
+_CATALOG_OPTIONS = {
+    "read_preference": _READ_PREFERENCES[CATALOG_READ_PREFERENCE],
+    "read_concern": ReadConcern(CATALOG_READ_CONCERN),
+}
+_PRIMARY_OPTIONS = {"read_preference": ReadPreference.PRIMARY}
+
+# ------------------------------
+# Client Lifecycle
+# ------------------------------
+
+client: Optional[AsyncIOMotorClient] = None
+
+
+async def connect_to_mongo():
+    """Create the MongoDB client; called from the application lifespan."""
+    global client
+    if client is None:
+        client = AsyncIOMotorClient(
+            MONGO_URI,
+            event_listeners=[mongo_command_listener, mongo_pool_listener],
+            **CLIENT_SETTINGS,
+        )
+        print(f"✅ Connected to MongoDB database: {DB_NAME}")
+
+
+def get_client() -> AsyncIOMotorClient:
+    if client is None:
+        raise RuntimeError("MongoDB client is not connected; call connect_to_mongo() first")
+    return client
+
+
+def get_database() -> AsyncIOMotorDatabase:
+    return get_client()[DB_NAME]
 
-# Collections
-customers_collection = database.get_collection("customers")
-products_collection = database.get_collection("products")
-orders_collection = database.get_collection("orders")
-cart_collection = database.get_collection("carts")
-counters_collection = database.get_collection("counters")
-categories_collection = database.get_collection("categories")
 
-print(f"✅ Connected to MongoDB database: {DB_NAME}")
+async def check_mongo_health() -> Dict[str, Any]:
+    """Ping the deployment and report topology and connection pool settings."""
+    db_client = get_client()
+    await db_client.admin.command("ping")
+    info = await db_client.server_info()
+    pool = db_client.options.pool_options
+    return {
+        "database": DB_NAME,
+        "server_version": info.get("version"),
+        "nodes": sorted(f"{host}:{port}" for host, port in db_client.nodes),
+        "pool": {
+            "max_size": pool.max_pool_size,
+            "min_size": pool.min_pool_size,
+            "max_idle_time_seconds": pool.max_idle_time_seconds,
+            "connections": mongo_pool_listener.snapshot(),
+        },
+        "compressors": CLIENT_SETTINGS["compressors"],
+        "catalog_read_preference": CATALOG_READ_PREFERENCE,
+    }
+
 
 # Function to close the MongoDB connection properly
 async def close_mongo_connection():
-    client.close()
-    print("❌ MongoDB connection closed.")
+    global client
+    if client is not None:
+        client.close()
+        client = None
+        print("❌ MongoDB connection closed.")
+
+
+# ------------------------------
+# Collections
+# ------------------------------
+
+class CollectionProxy:
+    """Module-level handle for a collection that resolves against the current client.
+
+    Routers import collections at import time, before the lifespan has
+    created the client; attribute access is forwarded to the real Motor
+    collection (with this collection's read options) once it exists.
+    """
+
+    def __init__(self, name: str, **options):
+        self.name = name
+        self.options = options
+        self._client = None
+        self._collection = None
+
+    def _resolve(self):
+        current = get_client()
+        if self._client is not current:
+            self._collection = current[DB_NAME].get_collection(self.name, **self.options)
+            self._client = current
+        return self._collection
+
+    def __getattr__(self, attr):
+        return getattr(self._resolve(), attr)
+
+
+customers_collection = CollectionProxy("customers", **_PRIMARY_OPTIONS)
+products_collection = CollectionProxy("products", **_CATALOG_OPTIONS)
+orders_collection = CollectionProxy("orders", **_PRIMARY_OPTIONS)
+cart_collection = CollectionProxy("carts", **_PRIMARY_OPTIONS)
+counters_collection = CollectionProxy("counters", **_PRIMARY_OPTIONS)
+categories_collection = CollectionProxy("categories", **_CATALOG_OPTIONS)
+sync_state_collection = CollectionProxy("sync_state", **_PRIMARY_OPTIONS)
+import_jobs_collection = CollectionProxy("import_jobs", **_PRIMARY_OPTIONS)
+media_jobs_collection = CollectionProxy("media_jobs", **_PRIMARY_OPTIONS)
+sales_rollups_collection = CollectionProxy("sales_rollups", **_PRIMARY_OPTIONS)
+
+# Catalog handles that always read from the primary, for read-after-write paths
+# (snapshot sync, media jobs, imports) that must not see a lagging secondary
+products_primary_collection = CollectionProxy("products", **_PRIMARY_OPTIONS)
+categories_primary_collection = CollectionProxy("categories", **_PRIMARY_OPTIONS)
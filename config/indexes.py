@@ -0,0 +1,186 @@
+import argparse
+import asyncio
+import sys
+from datetime import datetime
+
+from bson import ObjectId
+from pymongo import ASCENDING, DESCENDING, IndexModel
+from pymongo.errors import OperationFailure, PyMongoError
+
+from config.db import close_mongo_connection, connect_to_mongo, get_database
+
+# ------------------------------
+# Index Registry
+# ------------------------------
+
+# Secondary indexes per collection. Names are fixed so re-running is a no-op.
+INDEXES = {
+    "customers": [
+        IndexModel([("email", ASCENDING)], name="email_unique", unique=True),
+    ],
+    "carts": [
+        IndexModel([("customer_id", ASCENDING)], name="customer_id_unique", unique=True),
+    ],
+    "orders": [
+        IndexModel([("order_id", ASCENDING)], name="order_id_unique", unique=True),
+        IndexModel(
+            [("customer_id", ASCENDING), ("created_at", DESCENDING), ("_id", DESCENDING)],
+            name="customer_created_id",
+        ),
+        IndexModel([("status", ASCENDING), ("created_at", ASCENDING)], name="status_created"),
+        # Exports without a status filter: all orders or a date range, in created_at order
+        IndexModel([("created_at", ASCENDING), ("_id", ASCENDING)], name="created_id"),
+    ],
+    "media_jobs": [
+        IndexModel([("status", ASCENDING), ("run_at", ASCENDING)], name="status_run_at"),
+    ],
+    "sales_rollups": [
+        IndexModel(
+            [("kind", ASCENDING), ("day", ASCENDING), ("status", ASCENDING), ("product_id", ASCENDING)],
+            name="rollup_key",
+            unique=True,
+        ),
+    ],
+    "products": [
+        IndexModel([("category", ASCENDING), ("_id", ASCENDING)], name="category_id"),
+        IndexModel([("brand", ASCENDING), ("_id", ASCENDING)], name="brand_id"),
+        IndexModel([("created_at", ASCENDING), ("_id", ASCENDING)], name="created_id"),
+        IndexModel(
+            [("sku", ASCENDING)],
+            name="sku_unique",
+            unique=True,
+            partialFilterExpression={"sku": {"$type": "string"}},
+        ),
+    ],
+}
+
+# Server error codes for dropping an index that (or whose collection) does not exist
+INDEX_NOT_FOUND = {26, 27}
+
+# Indexes superseded by an entry above; dropped by ensure_indexes if present
+RETIRED_INDEXES = {
+    "orders": ["customer_created"],  # Prefix of customer_created_id
+}
+
+# Query shapes issued by the routes: (name, collection, filter, sort).
+# `--check` explains each one and fails if the winning plan is a COLLSCAN.
+QUERY_SHAPES = [
+    ("customer_auth.login", "customers", {"email": "probe@example.com"}, None),
+    ("cart.get_cart", "carts", {"customer_id": ObjectId()}, None),
+    ("orders.get_customer_orders", "orders", {"customer_id": "probe"}, None),
+    (
+        "orders.customer_history",
+        "orders",
+        {"customer_id": "probe"},
+        [("created_at", DESCENDING), ("_id", DESCENDING)],
+    ),
+    ("orders.get_order_detail", "orders", {"order_id": "ORD-000000"}, None),
+    ("orders.update_order_status", "orders", {"order_id": "ORD-000000"}, None),
+    (
+        "orders.export",
+        "orders",
+        {"status": "pending", "created_at": {"$gte": datetime(1970, 1, 1)}},
+        [("created_at", ASCENDING)],
+    ),
+    ("orders.export.all", "orders", {}, [("created_at", ASCENDING)]),
+    (
+        "orders.export.date_range",
+        "orders",
+        {"created_at": {"$gte": datetime(1970, 1, 1), "$lt": datetime(1970, 2, 1)}},
+        [("created_at", ASCENDING)],
+    ),
+    (
+        "media_jobs.claim",
+        "media_jobs",
+        {"status": {"$in": ["queued", "running"]}, "run_at": {"$lte": datetime(1970, 1, 1)}},
+        [("run_at", ASCENDING)],
+    ),
+    (
+        "orders.analytics",
+        "sales_rollups",
+        {"kind": "day", "day": {"$gte": datetime(1970, 1, 1), "$lt": datetime(1970, 2, 1)}},
+        None,
+    ),
+    ("products.get_products", "products", {}, [("_id", ASCENDING)]),
+    ("products.import.upsert_by_sku", "products", {"sku": "probe"}, None),
+    ("products.get_products.category", "products", {"category": "probe"}, [("_id", ASCENDING)]),
+    ("products.get_products.brand", "products", {"brand": "probe"}, [("_id", ASCENDING)]),
+    (
+        "products.get_products.created_at",
+        "products",
+        {},
+        [("created_at", ASCENDING), ("_id", ASCENDING)],
+    ),
+]
+
+
+async def ensure_indexes():
+    """Create every registered index. Safe to call on each startup."""
+    for collection_name, indexes in INDEXES.items():
+        try:
+            await get_database().get_collection(collection_name).create_indexes(indexes)
+        except PyMongoError as e:
+            # Existing duplicates or a conflicting definition must not stop the API
+            print(f"⚠️ Could not create indexes on {collection_name}: {e}")
+
+    for collection_name, names in RETIRED_INDEXES.items():
+        collection = get_database().get_collection(collection_name)
+        for name in names:
+            try:
+                await collection.drop_index(name)
+                print(f"ℹ️ Dropped retired index {collection_name}.{name}")
+            except OperationFailure as e:
+                if e.code not in INDEX_NOT_FOUND:
+                    print(f"⚠️ Could not drop index {collection_name}.{name}: {e}")
+            except PyMongoError as e:
+                print(f"⚠️ Could not drop index {collection_name}.{name}: {e}")
+
+
+def _plan_stages(plan):
+    """Yield every stage name in an explain() plan tree."""
+    if isinstance(plan, dict):
+        if "stage" in plan:
+            yield plan["stage"]
+        for value in plan.values():
+            yield from _plan_stages(value)
+    elif isinstance(plan, list):
+        for value in plan:
+            yield from _plan_stages(value)
+
+
+async def check_query_plans():
+    """Explain each registered query shape and return the names that scan a collection."""
+    failures = []
+    for name, collection_name, query, sort in QUERY_SHAPES:
+        cursor = get_database().get_collection(collection_name).find(query)
+        if sort:
+            cursor = cursor.sort(sort)
+        explanation = await cursor.explain()
+        stages = set(_plan_stages(explanation["queryPlanner"]["winningPlan"]))
+        status = "COLLSCAN" if "COLLSCAN" in stages else "ok"
+        print(f"{status:>8}  {name}  ({', '.join(sorted(stages))})")
+        if "COLLSCAN" in stages:
+            failures.append(name)
+    return failures
+
+
+async def _main(args):
+    await connect_to_mongo()
+    try:
+        if not args.check_only:
+            await ensure_indexes()
+        if args.check or args.check_only:
+            failures = await check_query_plans()
+            if failures:
+                print(f"❌ Collection scans in: {', '.join(failures)}")
+                return 1
+        return 0
+    finally:
+        await close_mongo_connection()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Create MongoDB indexes and verify query plans")
+    parser.add_argument("--check", action="store_true", help="verify query plans after creating indexes")
+    parser.add_argument("--check-only", action="store_true", help="verify query plans without creating indexes")
+    sys.exit(asyncio.run(_main(parser.parse_args())))
@@ -1,7 +1,19 @@
+from contextlib import asynccontextmanager
 from fastapi import FastAPI, Request
 from fastapi.middleware.cors import CORSMiddleware
 import uvicorn
 import os
+import time
+
+from config.db import check_mongo_health, close_mongo_connection, connect_to_mongo, products_collection
+from config.indexes import ensure_indexes
+from utils.cart_sessions import cart_sessions
+from utils.catalog_sync import CATALOG_SNAPSHOT_ENABLED, catalog_sync
+from utils.hashing import shutdown_hashing
+from utils.images import shutdown_images
+from utils.media import shutdown_uploads
+from utils.media_jobs import MEDIA_QUEUE_ENABLED, media_queue
+from utils.search import build_search_index, search_index
 
 # Import Route Handlers
 from routes.customer_auth import customer_auth_router
@@ -10,16 +22,48 @@ from routes.products_crud import product_router
 from routes.cart_crud import cart_router
 from routes.orders_crud import order_router
 from routes.category_crud import category_router
+from routes.metrics import metrics_router
+from routes.media_jobs import media_router
+from utils.admission import AdmissionMiddleware, AdmissionPolicy
+from utils.metrics import http_request_duration, http_requests_in_flight, route_template
 from starlette.responses import RedirectResponse
 
 
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """Prepare the database on startup and release connections on shutdown."""
+    await connect_to_mongo()
+    try:
+        health = await check_mongo_health()
+        print(f"✅ MongoDB ready: {health}")
+    except Exception as e:  # Report only: startup continues, as ensure_indexes does on errors
+        print(f"⚠️ MongoDB health check failed: {e}")
+    await ensure_indexes()
+    await build_search_index(products_collection)
+    if CATALOG_SNAPSHOT_ENABLED:
+        # Keep the search index in step with edits made on other workers
+        catalog_sync.products.listeners.append(search_index.on_change)
+        await catalog_sync.start()
+    if MEDIA_QUEUE_ENABLED:
+        await media_queue.start()
+    yield
+    await media_queue.stop()
+    await cart_sessions.close()
+    await catalog_sync.stop()
+    shutdown_uploads()
+    shutdown_hashing()
+    shutdown_images()
+    await close_mongo_connection()
+
+
 # Initialize FastAPI app
 app = FastAPI(
     title="E-commerce API",
     description="FastAPI Backend for E-commerce Platform",
     version="1.0",
     root_path="/",  # Explicitly set root path
-    redirect_slashes=False  # Disable automatic trailing slash redirects
+    redirect_slashes=False,  # Disable automatic trailing slash redirects
+    lifespan=lifespan,
 )
 
 
@@ -29,12 +73,35 @@ ALLOWED_ORIGINS = [
     "https://e-commerce-customer-frontend.vercel.app"
 ]
 
+# Admission control, per router prefix (see utils/admission.py). Concurrency limits
+# cover the bcrypt-bound auth routes, image uploads and the order export stream.
+ADMISSION_POLICIES = {
+    "": AdmissionPolicy(rate=20, burst=60),
+    "/customer-auth": AdmissionPolicy(
+        rate=0.5, burst=10, concurrency={"POST /login": 8, "POST /register": 4}, max_wait=1.0
+    ),
+    "/owner-auth": AdmissionPolicy(rate=0.2, burst=5, concurrency={"POST /login": 2}, max_wait=1.0),
+    "/products": AdmissionPolicy(
+        rate=20, burst=60,
+        concurrency={"POST /products": 4, "PUT /products/*": 4, "POST /products/import": 2},
+        max_wait=5.0,
+    ),
+    "/category": AdmissionPolicy(
+        rate=20, burst=60, concurrency={"POST /categories": 2, "PUT /categories/*": 2}, max_wait=5.0
+    ),
+    "/orders": AdmissionPolicy(rate=20, burst=60, concurrency={"GET /export": 2}, max_queue=4, max_wait=10.0),
+}
+
+# Added before CORS so CORSMiddleware wraps it and 429/503 responses stay readable by browsers
+app.add_middleware(AdmissionMiddleware, policies=ADMISSION_POLICIES)
+
 app.add_middleware(
     CORSMiddleware,
     allow_origins=ALLOWED_ORIGINS,
     allow_credentials=True,
     allow_methods=["GET", "POST", "PUT", "DELETE", "OPTIONS"],
-    allow_headers=["Authorization", "Content-Type"],
+    allow_headers=["Authorization", "Content-Type", "If-None-Match"],
+    expose_headers=["X-Next-Cursor", "ETag", "Retry-After"],
 ) 
 
 # 🔹 Fix: Enforce HTTPS if request is incorrectly redirected
@@ -46,6 +113,24 @@ async def force_https_middleware(request: Request, call_next):
         return RedirectResponse(url=str(url))
     return await call_next(request)
 
+# Per-route latency and in-flight counts for /metrics (outermost, so it times everything)
+@app.middleware("http")
+async def metrics_middleware(request: Request, call_next):
+    """Record how long each route takes to produce its response headers."""
+    in_flight = http_requests_in_flight.labels(request.method)
+    in_flight[0] += 1
+    started = time.perf_counter()
+    status = "500"
+    try:
+        response = await call_next(request)
+        status = str(response.status_code)
+        return response
+    finally:
+        in_flight[0] -= 1
+        http_request_duration.observe(
+            time.perf_counter() - started, request.method, route_template(request.scope), status
+        )
+
 # Register Routes
 app.include_router(customer_auth_router, prefix="/customer-auth", tags=["Customer Authentication"])
 app.include_router(owner_auth_router, prefix="/owner-auth", tags=["Owner Authentication"])
@@ -53,6 +138,8 @@ app.include_router(product_router, prefix="/products", tags=["Product Management
 app.include_router(cart_router, prefix="/cart", tags=["Cart Management"])
 app.include_router(order_router, prefix="/orders", tags=["Orders"])
 app.include_router(category_router, prefix="/category", tags=["Category Management"])
+app.include_router(media_router, prefix="/media", tags=["Media Jobs"])
+app.include_router(metrics_router, tags=["Monitoring"])
 
 # Root Endpoint
 @app.get("/", tags=["Root"])
@@ -2,11 +2,11 @@ from pydantic import BaseModel, Field
 from typing import List, Optional
 from bson import ObjectId
 
-# Custom ObjectId Type for Pydantic
+# Custom ObjectId Type for Pydantic v2
 class PyObjectId(str):
     @classmethod
-    def __get_pydantic_json_schema__(cls, schema):
-        schema.update(type="string")
+    def __get_pydantic_core_schema__(cls, source_type, handler):
+        return handler(str)  # Ensure ObjectId is treated as a string
 
     @classmethod
     def validate(cls, value):
@@ -1,7 +1,8 @@
 from pydantic import BaseModel, Field, HttpUrl, field_validator
 from pydantic_core.core_schema import ValidationInfo
-from typing import Optional
+from typing import Dict, Optional
 from bson import ObjectId
+from models.product import ImageVariant
 
 # Custom ObjectId Type for Pydantic v2
 class PyObjectId(str):
@@ -21,6 +22,8 @@ class Category(BaseModel):
     name: str
     description: Optional[str] = None
     image: Optional[HttpUrl] = None  # Single image URL
+    image_variants: Optional[Dict[str, ImageVariant]] = None  # thumbnail / card / full
+    images_status: Optional[str] = None  # Set while a queued image upload is pending or failed
     created_at: Optional[str] = None
     updated_at: Optional[str] = None
 
@@ -16,3 +16,15 @@ class Order(BaseModel):
     status: str = "pending"
     created_at: datetime = Field(default_factory=datetime.utcnow)
     updated_at: Optional[datetime] = None
+
+# Most orders one bulk status update may touch, in either selection mode
+MAX_BULK_ORDERS = 10000
+
+class OrderStatusBulkUpdate(BaseModel):
+    status: str  # Target status
+    # Either an explicit list of order IDs...
+    order_ids: Optional[List[str]] = Field(None, max_length=MAX_BULK_ORDERS)
+    # ...or a filter on current status and creation time
+    current_status: Optional[str] = None
+    start: Optional[datetime] = None
+    end: Optional[datetime] = None
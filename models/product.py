@@ -1,6 +1,6 @@
 from pydantic import BaseModel, Field, HttpUrl, field_validator
 from pydantic_core.core_schema import ValidationInfo
-from typing import List, Optional
+from typing import Dict, List, Optional
 from bson import ObjectId
 
 # Custom ObjectId Type for Pydantic v2
@@ -21,12 +21,22 @@ class Dimensions(BaseModel):
     width: float
     depth: float
 
+# One resized rendition of an uploaded image (see utils/images.py)
+class ImageVariant(BaseModel):
+    width: int
+    height: int
+    webp: str
+    jpeg: str
+
 # Product Schema
 class Product(BaseModel):
     id: Optional[PyObjectId] = Field(None, alias="_id")
+    sku: Optional[str] = None  # Supplier stock-keeping unit, unique when set
     name: str
     description: Optional[str] = None
     images: List[HttpUrl] = []
+    image_variants: List[Dict[str, ImageVariant]] = []  # Per image: thumbnail / card / full
+    images_status: Optional[str] = None  # "pending" while the media queue uploads, then "ready" / "failed"
     price: float
     quantity: int
     category: Optional[str] = None
@@ -50,6 +60,7 @@ class Product(BaseModel):
 
 # Schema for Partial Updates
 class ProductUpdate(BaseModel):
+    sku: Optional[str] = None
     name: Optional[str] = None
     description: Optional[str] = None
     images: Optional[List[HttpUrl]] = None
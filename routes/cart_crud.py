@@ -1,6 +1,7 @@
 from fastapi import APIRouter, HTTPException, Depends
 from models.cart import Cart, CartItem, PyObjectId
 from config.db import cart_collection
+from utils.cart_sessions import CART_SESSIONS_ENABLED, cart_sessions
 from bson import ObjectId
 from typing import List
 from datetime import datetime
@@ -9,92 +10,166 @@ from datetime import datetime
 cart_router = APIRouter()
 
 
+# ------------------------------
+# Update Pipelines
+# ------------------------------
+# Every mutation is a single update_one with an aggregation pipeline, so the
+# server applies the change and recomputes total_price atomically.
+
+def customer_object_id(customer_id: str) -> ObjectId:
+    if not ObjectId.is_valid(customer_id):
+        raise HTTPException(status_code=400, detail="Invalid Customer ID")
+    return ObjectId(customer_id)
+
+
+def recompute_total_stage() -> dict:
+    """Pipeline stage that derives total_price from the items array."""
+    return {"$set": {"total_price": {"$sum": {"$map": {
+        "input": "$items",
+        "as": "i",
+        "in": {"$multiply": ["$$i.price", "$$i.quantity"]},
+    }}}}}
+
+
+def map_item_stage(product_id: str, quantity_expr, now: str) -> dict:
+    """Pipeline stage that rewrites the quantity of one line item."""
+    return {"$set": {
+        "items": {"$map": {
+            "input": "$items",
+            "as": "i",
+            "in": {"$cond": [
+                {"$eq": ["$$i.product_id", {"$literal": product_id}]},
+                {"$mergeObjects": ["$$i", {"quantity": quantity_expr}]},
+                "$$i",
+            ]},
+        }},
+        "updated_at": now,
+    }}
+
+
 # Get Customer Cart
 @cart_router.get("/cart/{customer_id}", response_model=Cart)
 async def get_cart(customer_id: str):
-    cart = cart_collection.find_one({"customer_id": ObjectId(customer_id)})
+    if CART_SESSIONS_ENABLED:
+        cart = (await cart_sessions.get(customer_object_id(customer_id))).doc
+    else:
+        cart = await cart_collection.find_one({"customer_id": customer_object_id(customer_id)})
     if not cart:
-        return Cart(customer_id=ObjectId(customer_id), items=[], total_price=0.0)
-    return cart
+        return Cart(customer_id=customer_id, items=[], total_price=0.0)
+    # A cart created in a session has no _id until its first flush
+    cart_id = str(cart["_id"]) if "_id" in cart else None
+    return {**cart, "_id": cart_id, "customer_id": str(cart["customer_id"])}
 
 
 # Add Item to Cart
 @cart_router.post("/cart/{customer_id}/add")
 async def add_to_cart(customer_id: str, item: CartItem):
-    cart = cart_collection.find_one({"customer_id": ObjectId(customer_id)})
-
-    if not cart:
-        new_cart = Cart(
-            customer_id=ObjectId(customer_id),
-            items=[item],
-            total_price=item.price * item.quantity,
-            created_at=datetime.utcnow().isoformat(),
-            updated_at=datetime.utcnow().isoformat()
-        )
-        cart_collection.insert_one(new_cart.dict(by_alias=True))
+    if CART_SESSIONS_ENABLED:
+        created = await cart_sessions.add_item(customer_object_id(customer_id), item.dict(by_alias=True))
+        return {"message": "Cart created and item added" if created else "Item added to cart"}
+
+    now = datetime.utcnow().isoformat()
+    product_id = str(item.product_id)
+
+    # Bump the quantity if the product is already in the cart, otherwise append it
+    add_item = {"$let": {
+        "vars": {"items": {"$ifNull": ["$items", []]}},
+        "in": {"$cond": [
+            {"$in": [{"$literal": product_id}, "$$items.product_id"]},
+            {"$map": {
+                "input": "$$items",
+                "as": "i",
+                "in": {"$cond": [
+                    {"$eq": ["$$i.product_id", {"$literal": product_id}]},
+                    {"$mergeObjects": ["$$i", {"quantity": {"$add": ["$$i.quantity", item.quantity]}}]},
+                    "$$i",
+                ]},
+            }},
+            {"$concatArrays": ["$$items", [{"$literal": item.dict(by_alias=True)}]]},
+        ]},
+    }}
+
+    result = await cart_collection.update_one(
+        {"customer_id": customer_object_id(customer_id)},
+        [
+            {"$set": {
+                "items": add_item,
+                "created_at": {"$ifNull": ["$created_at", now]},
+                "updated_at": now,
+            }},
+            recompute_total_stage(),
+        ],
+        upsert=True,
+    )
+
+    if result.upserted_id is not None:
         return {"message": "Cart created and item added"}
-
-    # Check if item exists, update quantity
-    found = False
-    for cart_item in cart["items"]:
-        if cart_item["product_id"] == str(item.product_id):
-            cart_item["quantity"] += item.quantity
-            found = True
-            break
-
-    if not found:
-        cart["items"].append(item.dict(by_alias=True))
-
-    cart["total_price"] = sum(i["price"] * i["quantity"] for i in cart["items"])
-    cart["updated_at"] = datetime.utcnow().isoformat()
-    
-    cart_collection.update_one({"customer_id": ObjectId(customer_id)}, {"$set": cart})
-    
     return {"message": "Item added to cart"}
 
 
 # Update Item Quantity in Cart
 @cart_router.put("/cart/{customer_id}/update/{product_id}")
 async def update_cart_item(customer_id: str, product_id: str, quantity: int):
-    cart = cart_collection.find_one({"customer_id": ObjectId(customer_id)})
-    
-    if not cart:
-        raise HTTPException(status_code=404, detail="Cart not found")
-
-    for item in cart["items"]:
-        if item["product_id"] == product_id:
-            item["quantity"] = quantity
-            break
-    else:
+    customer_oid = customer_object_id(customer_id)
+    if CART_SESSIONS_ENABLED:
+        missing = await cart_sessions.set_quantity(customer_oid, product_id, quantity)
+        if missing == "cart":
+            raise HTTPException(status_code=404, detail="Cart not found")
+        if missing == "item":
+            raise HTTPException(status_code=404, detail="Product not found in cart")
+        return {"message": "Cart updated"}
+
+    result = await cart_collection.update_one(
+        {"customer_id": customer_oid, "items.product_id": product_id},
+        [
+            map_item_stage(product_id, {"$literal": quantity}, datetime.utcnow().isoformat()),
+            recompute_total_stage(),
+        ],
+    )
+
+    if result.matched_count == 0:
+        # Only the failure path pays for a second lookup to pick the right error
+        if not await cart_collection.find_one({"customer_id": customer_oid}, {"_id": 1}):
+            raise HTTPException(status_code=404, detail="Cart not found")
         raise HTTPException(status_code=404, detail="Product not found in cart")
 
-    cart["total_price"] = sum(i["price"] * i["quantity"] for i in cart["items"])
-    cart["updated_at"] = datetime.utcnow().isoformat()
-
-    cart_collection.update_one({"customer_id": ObjectId(customer_id)}, {"$set": cart})
-
     return {"message": "Cart updated"}
 
 
 # Remove Item from Cart
 @cart_router.delete("/cart/{customer_id}/remove/{product_id}")
 async def remove_cart_item(customer_id: str, product_id: str):
-    cart = cart_collection.find_one({"customer_id": ObjectId(customer_id)})
-
-    if not cart:
+    if CART_SESSIONS_ENABLED:
+        if not await cart_sessions.remove_item(customer_object_id(customer_id), product_id):
+            raise HTTPException(status_code=404, detail="Cart not found")
+        return {"message": "Item removed from cart"}
+
+    result = await cart_collection.update_one(
+        {"customer_id": customer_object_id(customer_id)},
+        [
+            {"$set": {
+                "items": {"$filter": {
+                    "input": "$items",
+                    "as": "i",
+                    "cond": {"$ne": ["$$i.product_id", {"$literal": product_id}]},
+                }},
+                "updated_at": datetime.utcnow().isoformat(),
+            }},
+            recompute_total_stage(),
+        ],
+    )
+
+    if result.matched_count == 0:
         raise HTTPException(status_code=404, detail="Cart not found")
 
-    cart["items"] = [item for item in cart["items"] if item["product_id"] != product_id]
-    cart["total_price"] = sum(i["price"] * i["quantity"] for i in cart["items"])
-    cart["updated_at"] = datetime.utcnow().isoformat()
-
-    cart_collection.update_one({"customer_id": ObjectId(customer_id)}, {"$set": cart})
-
     return {"message": "Item removed from cart"}
 
 
 # Clear Entire Cart
 @cart_router.delete("/cart/{customer_id}/clear")
 async def clear_cart(customer_id: str):
-    cart_collection.delete_one({"customer_id": ObjectId(customer_id)})
+    if CART_SESSIONS_ENABLED:
+        await cart_sessions.clear(customer_object_id(customer_id))
+        return {"message": "Cart cleared"}
+    await cart_collection.delete_one({"customer_id": customer_object_id(customer_id)})
     return {"message": "Cart cleared"}
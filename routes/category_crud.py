@@ -1,9 +1,14 @@
-from fastapi import APIRouter, HTTPException, UploadFile, File, Form
+from fastapi import APIRouter, HTTPException, UploadFile, File, Form, Request
 from models.categories import CategoryUpdate
-from config.db import categories_collection
+from config.db import categories_collection, categories_primary_collection
+from utils.cache import cached_response, catalog_cache
+from utils.catalog_sync import CATALOG_SNAPSHOT_ENABLED, catalog_sync
+from utils.images import ImageError
+from utils.media import UploadError, upload_images
+from utils.media_jobs import MEDIA_QUEUE_ENABLED, media_queue, read_images
+from utils.serialization import dumps
 from bson import ObjectId
 from datetime import datetime
-import cloudinary.uploader
 
 # Initialize Router
 category_router = APIRouter()
@@ -13,13 +18,21 @@ category_router = APIRouter()
 # ------------------------------
 
 @category_router.get("/categories")
-async def get_categories():
-    """Retrieve all categories"""
-    categories = [
-        {**category, "_id": str(category["_id"])}
-        for category in await categories_collection.find({}).to_list(length=100)
-    ]
-    return categories
+async def get_categories(request: Request):
+    """Retrieve all categories (cached until a category changes)"""
+    entry = catalog_cache.lookup("categories", "all")
+    if entry:
+        return cached_response(request, entry)
+    version = catalog_cache.version("categories")
+
+    if CATALOG_SNAPSHOT_ENABLED and catalog_sync.categories.ready:
+        docs = catalog_sync.categories.sorted_docs(["_id"])[0][:100]
+    else:
+        # Cached under the current version: must not come from a lagging secondary
+        docs = await categories_primary_collection.find({}).to_list(length=100)
+
+    entry = catalog_cache.store("categories", "all", version, dumps(docs))
+    return cached_response(request, entry)
 
 
 @category_router.post("/categories")
@@ -33,26 +46,50 @@ async def create_category(
     # Cloudinary folder for category images
     cloudinary_folder = f"ph-categories/{name.replace(' ', '-')}"  # Avoid spaces in folder names
 
-    # Upload image if provided
+    # Upload image if provided (in the background when the media queue is on)
     image_url = None
-    if image:
+    image_variants = None
+    image_data = None
+    if image and MEDIA_QUEUE_ENABLED:
         try:
-            result = cloudinary.uploader.upload(image.file, folder=cloudinary_folder)
-            image_url = result["secure_url"]
-        except Exception as e:
+            image_data = (await read_images([image.file]))[0]
+        except ImageError as e:
+            raise HTTPException(status_code=400, detail=f"Invalid image: {str(e)}")
+    elif image:
+        try:
+            image_variants = (await upload_images([image.file], cloudinary_folder))[0]
+        except ImageError as e:
+            raise HTTPException(status_code=400, detail=f"Invalid image: {str(e)}")
+        except UploadError as e:
             raise HTTPException(status_code=500, detail=f"Cloudinary upload failed: {str(e)}")
+        image_url = image_variants["full"]["jpeg"]
 
     # Prepare category data
     category_data = {
         "name": name,
         "description": description,
         "image": image_url,  # Store single image URL
+        "image_variants": image_variants,
         "created_at": datetime.utcnow().isoformat(),
         "updated_at": datetime.utcnow().isoformat(),
     }
+    if image_data is not None:
+        job_id = ObjectId()
+        category_data.update(images_status="pending", media_job_id=job_id)
 
     result = await categories_collection.insert_one(category_data)
-    return {"_id": str(result.inserted_id), "image_url": image_url}
+    if image_data is not None:
+        try:
+            await media_queue.enqueue(job_id, "categories", result.inserted_id, cloudinary_folder, [image_data])
+        except Exception as e:
+            await categories_collection.delete_one({"_id": result.inserted_id})
+            raise HTTPException(status_code=500, detail=f"Could not queue image upload: {str(e)}")
+    catalog_cache.invalidate("categories")
+
+    response = {"_id": str(result.inserted_id), "image_url": image_url, "image_variants": image_variants}
+    if image_data is not None:
+        response.update(images_status="pending", media_job_id=str(job_id), status_url=f"/media/jobs/{job_id}")
+    return response
 
 
 @category_router.put("/categories/{category_id}")
@@ -75,13 +112,26 @@ async def update_category(
         update_data["description"] = description
 
     # Upload new image if provided
+    image_data = None
     if image:
         cloudinary_folder = f"ph-categories/{name.replace(' ', '-') if name else 'updated-category'}"
+    if image and MEDIA_QUEUE_ENABLED:
         try:
-            result = cloudinary.uploader.upload(image.file, folder=cloudinary_folder)
-            update_data["image"] = result["secure_url"]
-        except Exception as e:
+            image_data = (await read_images([image.file]))[0]
+        except ImageError as e:
+            raise HTTPException(status_code=400, detail=f"Invalid image: {str(e)}")
+        job_id = ObjectId()
+        update_data["images_status"] = "pending"
+        update_data["media_job_id"] = job_id  # A job still running for an older image no longer applies
+    elif image:
+        try:
+            image_variants = (await upload_images([image.file], cloudinary_folder))[0]
+        except ImageError as e:
+            raise HTTPException(status_code=400, detail=f"Invalid image: {str(e)}")
+        except UploadError as e:
             raise HTTPException(status_code=500, detail=f"Cloudinary upload failed: {str(e)}")
+        update_data["image"] = image_variants["full"]["jpeg"]
+        update_data["image_variants"] = image_variants
 
     update_data["updated_at"] = datetime.utcnow().isoformat()
 
@@ -91,7 +141,22 @@ async def update_category(
 
     if result.matched_count == 0:
         raise HTTPException(status_code=404, detail="Category not found")
-
+    if image_data is not None:
+        try:
+            await media_queue.enqueue(job_id, "categories", ObjectId(category_id), cloudinary_folder, [image_data])
+        except Exception as e:
+            await categories_collection.update_one(
+                {"_id": ObjectId(category_id), "media_job_id": job_id}, {"$set": {"images_status": "failed"}}
+            )
+            raise HTTPException(status_code=500, detail=f"Could not queue image upload: {str(e)}")
+    catalog_cache.invalidate("categories")
+
+    if image_data is not None:
+        return {
+            "message": "Category updated successfully",
+            "images_status": "pending",
+            "status_url": f"/media/jobs/{job_id}",
+        }
     return {"message": "Category updated successfully"}
 
 
@@ -104,5 +169,6 @@ async def delete_category(category_id: str):
     result = await categories_collection.delete_one({"_id": ObjectId(category_id)})
     if result.deleted_count == 0:
         raise HTTPException(status_code=404, detail="Category not found")
+    catalog_cache.invalidate("categories")
 
     return {"message": "Category deleted successfully"}
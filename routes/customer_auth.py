@@ -1,38 +1,20 @@
 from fastapi import APIRouter, HTTPException
 from pydantic import BaseModel, EmailStr
 from config.db import customers_collection
+from pymongo.errors import DuplicateKeyError
+from utils.auth import create_jwt_token
+from utils.hashing import hash_password, verify_password
 import random
 import string
-import jwt
-from jwt import encode, decode
-import datetime
-from passlib.context import CryptContext
 from typing import Optional
 
 customer_auth_router = APIRouter()
 
-# ✅ JWT Secret & Algorithm
-SECRET_KEY = "your_secret_key"  # Change this in production
-ALGORITHM = "HS256"
-
-# ✅ Password hashing
-pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
-
 # ✅ Function to generate unique customer ID
 def generate_customer_id():
     """Generate a random 8-character alphanumeric customer ID."""
     return ''.join(random.choices(string.ascii_uppercase + string.digits, k=8))
 
-# ✅ Function to create a JWT token
-def create_jwt_token(data: dict):
-    """Generate a JWT token."""
-    payload = {
-        "exp": datetime.datetime.utcnow() + datetime.timedelta(hours=24),
-        "iat": datetime.datetime.utcnow(),
-        "sub": data
-    }
-    return jwt.encode(payload, SECRET_KEY, algorithm=ALGORITHM)
-
 # ✅ Customer Registration Model
 class RegisterRequest(BaseModel):
     name: str
@@ -62,16 +44,20 @@ async def customer_register(data: RegisterRequest):
         "name": data.name,
         "email": data.email,
         "customer_id": customer_id,
-        "password": pwd_context.hash(data.password),  # Hash password
+        "password": await hash_password(data.password),  # Hash password off the event loop
         "gst_required": data.gst_required,
         "gst_number": data.gst_number if data.gst_required else None,
         "company_name": data.company_name if data.gst_required else None,
         "billing_address": data.billing_address if data.gst_required else None,
     }
 
-    await customers_collection.insert_one(new_customer)
+    try:
+        await customers_collection.insert_one(new_customer)
+    except DuplicateKeyError:
+        # A concurrent registration won the race on the unique email index
+        raise HTTPException(status_code=400, detail="User with this email already exists")
 
-    token = create_jwt_token({"customer_id": customer_id, "email": data.email})
+    token = create_jwt_token({"customer_id": customer_id, "email": data.email}, scope="customer")
 
     return {
         "message": "Registration successful",
@@ -84,10 +70,18 @@ async def customer_register(data: RegisterRequest):
 async def customer_login(data: LoginRequest):
     user = await customers_collection.find_one({"email": data.email})
 
-    if not user or not pwd_context.verify(data.password, user["password"]):
+    if not user:
+        raise HTTPException(status_code=401, detail="Invalid credentials")
+
+    valid, new_hash = await verify_password(data.password, user["password"])
+    if not valid:
         raise HTTPException(status_code=401, detail="Invalid credentials")
 
-    token = create_jwt_token({"customer_id": user["customer_id"], "email": user["email"]})
+    # Transparently upgrade hashes made with an older cost factor
+    if new_hash:
+        await customers_collection.update_one({"_id": user["_id"]}, {"$set": {"password": new_hash}})
+
+    token = create_jwt_token({"customer_id": user["customer_id"], "email": user["email"]}, scope="customer")
 
     return {
         "message": "Login successful",
@@ -0,0 +1,50 @@
+from fastapi import APIRouter, HTTPException
+from config.db import media_jobs_collection
+from utils.media_jobs import media_queue
+from bson import ObjectId
+
+# Initialize Router
+media_router = APIRouter()
+
+# ------------------------------
+# Media Job Endpoints
+# ------------------------------
+
+def job_summary(job: dict) -> dict:
+    """Public view of a job (without the GridFS file ids)."""
+    return {
+        "_id": str(job["_id"]),
+        "target": job["target"],
+        "target_id": str(job["target_id"]),
+        "status": job["status"],
+        "attempts": job["attempts"],
+        "last_error": job.get("last_error"),
+        # While queued this is the next attempt; while running, the lease expiry
+        "run_at": job.get("run_at"),
+        "created_at": job["created_at"],
+        "updated_at": job.get("updated_at"),
+        "finished_at": job.get("finished_at"),
+    }
+
+
+@media_router.get("/jobs/{job_id}")
+async def get_media_job(job_id: str):
+    """Progress of a background image upload."""
+    if not ObjectId.is_valid(job_id):
+        raise HTTPException(status_code=400, detail="Invalid Job ID")
+
+    job = await media_jobs_collection.find_one({"_id": ObjectId(job_id)}, {"files": 0})
+    if not job:
+        raise HTTPException(status_code=404, detail="Media job not found")
+    return job_summary(job)
+
+
+@media_router.post("/jobs/{job_id}/retry")
+async def retry_media_job(job_id: str):
+    """Queue a failed image upload again."""
+    if not ObjectId.is_valid(job_id):
+        raise HTTPException(status_code=400, detail="Invalid Job ID")
+
+    if not await media_queue.retry(ObjectId(job_id)):
+        raise HTTPException(status_code=409, detail="Only failed jobs can be retried")
+    return {"message": "Media job queued", "status_url": f"/media/jobs/{job_id}"}
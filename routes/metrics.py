@@ -0,0 +1,31 @@
+from fastapi import APIRouter
+from fastapi.responses import PlainTextResponse
+from utils.cache import catalog_cache
+from utils.hashing import stats as hashing_stats
+from utils.metrics import Counter, Gauge, render_metrics
+
+metrics_router = APIRouter()
+
+# Values owned by other modules, read at scrape time
+Gauge(
+    "password_hash_pending", "bcrypt operations queued or running in the process pool",
+    collect=lambda: {(): hashing_stats["pending"]},
+)
+Counter(
+    "password_hash_rejected_total", "bcrypt operations rejected because the pool was saturated",
+    collect=lambda: {(): hashing_stats["rejected"]},
+)
+Counter(
+    "password_hash_failed_total", "bcrypt operations that raised in the worker pool",
+    collect=lambda: {(): hashing_stats["failed"]},
+)
+Counter(
+    "catalog_cache_lookups_total", "Catalog cache lookups", ("result",),
+    collect=lambda: {("hit",): catalog_cache.hits, ("miss",): catalog_cache.misses},
+)
+
+
+@metrics_router.get("/metrics", response_class=PlainTextResponse)
+async def metrics():
+    """Expose metrics in the Prometheus text format."""
+    return PlainTextResponse(render_metrics(), media_type="text/plain; version=0.0.4")
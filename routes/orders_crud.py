@@ -1,72 +1,403 @@
 from fastapi import APIRouter, HTTPException
-from config.db import orders_collection, counters_collection
-from models.orders import Order
+from fastapi.responses import StreamingResponse
+from config.db import cart_collection, get_client, orders_collection, products_collection, products_primary_collection
+from models.orders import MAX_BULK_ORDERS, Order, OrderItem, OrderStatusBulkUpdate
+from pymongo import ReadPreference, UpdateOne
+from pymongo.read_concern import ReadConcern
+from pymongo.write_concern import WriteConcern
+from utils.cache import catalog_cache
+from utils.cart_sessions import CART_SESSIONS_ENABLED, cart_sessions
+from utils.ids import order_id_allocator
+from utils.sales_rollups import record_orders, record_status_changes, sales_summary
+from utils.search import refresh_search_index
+from utils.pagination import decode_cursor, encode_cursor, keyset_filter
+from utils.serialization import FastJSONResponse
+from utils.streaming import csv_stream, json_array_stream, ndjson_stream
 from bson import ObjectId
-from datetime import datetime
-from typing import List
+from contextlib import nullcontext
+from datetime import datetime, timedelta
+from typing import List, Literal, Optional
 from fastapi import Query
 
 
 order_router = APIRouter()
 
+ORDER_STATUSES = ["pending", "shipped", "delivered", "cancelled"]
+
+# Legal status moves; delivered and cancelled orders are final
+ORDER_TRANSITIONS = {
+    "pending": {"shipped", "cancelled"},
+    "shipped": {"delivered", "cancelled"},
+    "delivered": set(),
+    "cancelled": set(),
+}
+
+# Newest first; `_id` breaks ties between orders created in the same instant
+HISTORY_SORT = [("created_at", -1), ("_id", -1)]
+
+# Exactly the fields of the Order model. Responses built from raw documents skip
+# response_model filtering, so `_id` and fields outside the model are projected away
+ORDER_PROJECTION = {
+    "_id": 0,
+    **{name: 1 for name in Order.model_fields if name != "items"},
+    **{f"items.{name}": 1 for name in OrderItem.model_fields},
+}
+
+# List-view fields of an order; the item count is computed by the server
+ORDER_SUMMARY_PROJECTION = {
+    "order_id": 1,
+    "status": 1,
+    "total_price": 1,
+    "created_at": 1,
+    "updated_at": 1,
+    "item_count": {"$size": {"$ifNull": ["$items", []]}},
+}
+
+# Columns written by the CSV export; items are flattened into a count
+EXPORT_CSV_COLUMNS = [
+    "order_id", "customer_id", "status", "total_price", "item_count", "created_at", "updated_at"
+]
+
 async def get_next_order_id():
-    """Fetch the next sequential order ID, creating a counter if it doesn't exist."""
-    counter = await counters_collection.find_one_and_update(
-        {"_id": "order_id"},
-        {"$inc": {"seq": 1}},
-        upsert=True,  
-        return_document=True
-    )
-    return counter["seq"]
+    """Fetch the next order ID from this worker's reserved block of IDs."""
+    return await order_id_allocator.next()
 
 # ✅ Place a new order with a sequential order ID
 @order_router.post("/", response_model=Order)
 async def create_order(order: Order):
     order_dict = order.dict()
+    if CART_SESSIONS_ENABLED and ObjectId.is_valid(order.customer_id):
+        # Persist any pending cart changes before the order is placed from them
+        await cart_sessions.flush(ObjectId(order.customer_id), reason="order")
 
-    # Ensure counter exists
-    if not await counters_collection.find_one({"_id": "order_id"}):
-        await counters_collection.insert_one({"_id": "order_id", "seq": 0})
-
-    # Generate sequential order ID
+    # Generate order ID (no round trip unless this worker's block is used up)
     next_order_id = await get_next_order_id()
     order_dict["order_id"] = f"ORD-{next_order_id:06d}"  # Format: "ORD-000001"
 
     order_dict["created_at"] = datetime.utcnow()
     result = await orders_collection.insert_one(order_dict)
+    await record_orders([(order_dict, order_dict["status"], 1)])
 
     # ✅ Return response including order_id
     return {**order_dict, "_id": str(result.inserted_id)}
 
 
+# ✅ Turn a customer's cart into an order, reserving stock (FOR CUSTOMER)
+@order_router.post("/checkout/{customer_id}", response_model=Order)
+async def checkout(customer_id: str):
+    """Check out the cart in one multi-document transaction.
+
+    Prices come from the products collection, stock is decremented with one
+    conditional bulk_write, and the order insert and cart removal commit
+    together. Round trips stay constant regardless of the number of lines;
+    transient transaction errors (e.g. write conflicts with a concurrent
+    checkout of the same product) are retried by with_transaction.
+    """
+    if not ObjectId.is_valid(customer_id):
+        raise HTTPException(status_code=400, detail="Invalid Customer ID")
+
+    # Allocated outside the transaction: a retried or aborted checkout only leaves a gap
+    order_id = f"ORD-{await get_next_order_id():06d}"
+
+    async def place_order(session):
+        cart = await cart_collection.find_one({"customer_id": ObjectId(customer_id)}, session=session)
+        if not cart or not cart.get("items"):
+            raise HTTPException(status_code=400, detail="Cart is empty")
+
+        requested = {}
+        for item in cart["items"]:
+            if not ObjectId.is_valid(item["product_id"]):
+                raise HTTPException(status_code=400, detail=f"Invalid product in cart: {item['product_id']}")
+            requested[item["product_id"]] = requested.get(item["product_id"], 0) + item["quantity"]
+
+        products = {
+            str(product["_id"]): product
+            for product in await products_collection.find(
+                {"_id": {"$in": [ObjectId(pid) for pid in requested]}},
+                {"name": 1, "price": 1, "quantity": 1},
+                session=session,
+            ).to_list(None)
+        }
+
+        unavailable = [
+            {"product_id": pid, "requested": qty, "available": products[pid]["quantity"] if pid in products else 0}
+            for pid, qty in requested.items()
+            if pid not in products or products[pid]["quantity"] < qty
+        ]
+        if unavailable:
+            raise HTTPException(status_code=409, detail={"message": "Insufficient stock", "items": unavailable})
+
+        # Conditional decrements: a line only applies while enough stock remains. updated_at
+        # changes too, so the catalog snapshot's polling fallback picks up the new stock.
+        now = datetime.utcnow().isoformat()
+        result = await products_collection.bulk_write(
+            [
+                UpdateOne(
+                    {"_id": ObjectId(pid), "quantity": {"$gte": qty}},
+                    {"$inc": {"quantity": -qty}, "$set": {"updated_at": now}},
+                )
+                for pid, qty in requested.items()
+            ],
+            ordered=False,
+            session=session,
+        )
+        if result.modified_count != len(requested):
+            raise HTTPException(status_code=409, detail="Stock changed during checkout, please retry")
+
+        items = [
+            {"product_id": pid, "name": products[pid]["name"], "price": products[pid]["price"], "quantity": qty}
+            for pid, qty in requested.items()
+        ]
+        order_dict = Order(
+            order_id=order_id,
+            customer_id=customer_id,
+            items=items,
+            total_price=sum(item["price"] * item["quantity"] for item in items),
+        ).dict()
+        inserted = await orders_collection.insert_one(order_dict, session=session)
+        await cart_collection.delete_one({"_id": cart["_id"]}, session=session)
+        await record_orders([(order_dict, order_dict["status"], 1)], session=session)
+        return {**order_dict, "_id": str(inserted.inserted_id)}
+
+    # The transaction reads the cart from Mongo: the in-memory cart is written back first,
+    # changes to it are refused until the transaction ends, and it is re-read afterwards
+    holding = cart_sessions.checkout(ObjectId(customer_id)) if CART_SESSIONS_ENABLED else nullcontext()
+    async with holding, await get_client().start_session() as session:
+        order = await session.with_transaction(
+            place_order,
+            read_concern=ReadConcern("snapshot"),
+            write_concern=WriteConcern("majority"),
+            read_preference=ReadPreference.PRIMARY,
+        )
+
+    catalog_cache.invalidate("products")  # Stock levels changed
+    await refresh_search_index(
+        products_primary_collection, {ObjectId(item["product_id"]) for item in order["items"]}
+    )
+    return order
+
+
 # ✅ Get all orders (FOR OWNER)
 @order_router.get("/", response_model=List[Order])
 async def get_all_orders():
-    orders = await orders_collection.find().to_list(None)
-    return [{**order, "_id": str(order["_id"]), "order_id": order["order_id"]} for order in orders]
+    orders = await orders_collection.find({}, ORDER_PROJECTION).to_list(None)
+    # Documents come straight from our own collection: skip per-order rebuild and revalidation
+    return FastJSONResponse(orders)
+
+
+# ✅ Sales by day/week, status breakdown and top products (FOR OWNER)
+@order_router.get("/analytics")
+async def sales_analytics(
+    start: Optional[datetime] = Query(None, description="Defaults to 30 days before end"),
+    end: Optional[datetime] = Query(None, description="Exclusive; defaults to now"),
+    interval: Literal["day", "week"] = "day",
+    top: int = Query(10, ge=1, le=100),
+):
+    """Read from the sales_rollups collection instead of scanning orders."""
+    end = end or datetime.utcnow()
+    start = start or end - timedelta(days=30)
+    if start >= end:
+        raise HTTPException(status_code=400, detail="start must be before end")
+    return FastJSONResponse(await sales_summary(start, end, interval, top))
+
+
+# ✅ Stream all orders as JSON / NDJSON / CSV (FOR OWNER)
+@order_router.get("/export")
+async def export_orders(
+    format: Literal["json", "ndjson", "csv"] = "ndjson",
+    status: Optional[str] = None,
+    start: Optional[datetime] = Query(None, description="Only orders created at or after this time"),
+    end: Optional[datetime] = Query(None, description="Only orders created before this time"),
+    batch_size: int = Query(500, ge=1, le=10000),
+):
+    """Export orders straight from the Motor cursor so memory stays flat."""
+    if status is not None and status not in ORDER_STATUSES:
+        raise HTTPException(status_code=400, detail="Invalid order status")
+
+    query = {}
+    if status:
+        query["status"] = status
+    if start or end:
+        query["created_at"] = {}
+        if start:
+            query["created_at"]["$gte"] = start
+        if end:
+            query["created_at"]["$lt"] = end
+
+    cursor = orders_collection.find(query, sort=[("created_at", 1)], batch_size=batch_size)
+    headers = {"Content-Disposition": f'attachment; filename="orders.{format}"'}
+
+    def serialize(order):
+        return order  # ObjectId and datetime are handled by the encoder
+
+    if format == "csv":
+        def to_row(order):
+            row = {**order, "item_count": len(order.get("items", []))}
+            for field in ("created_at", "updated_at"):
+                if isinstance(row.get(field), datetime):
+                    row[field] = row[field].isoformat()
+            return row
+
+        return StreamingResponse(
+            csv_stream(cursor, EXPORT_CSV_COLUMNS, to_row), media_type="text/csv", headers=headers
+        )
+    if format == "json":
+        return StreamingResponse(
+            json_array_stream(cursor, serialize), media_type="application/json", headers=headers
+        )
+    return StreamingResponse(
+        ndjson_stream(cursor, serialize), media_type="application/x-ndjson", headers=headers
+    )
 
 # ✅ Get orders by customer ID (FOR CUSTOMER)
 @order_router.get("/customer/{customer_id}", response_model=List[Order])
 async def get_customer_orders(customer_id: str):
-    orders = await orders_collection.find({"customer_id": customer_id}).to_list(None)
+    orders = await orders_collection.find({"customer_id": customer_id}, ORDER_PROJECTION).to_list(None)
     if not orders:
         raise HTTPException(status_code=404, detail="No orders found for this customer")
-    return [{**order, "_id": str(order["_id"]), "order_id": order["order_id"]} for order in orders]
+    return FastJSONResponse(orders)
+
+
+# ✅ Paginated order history summaries (FOR CUSTOMER)
+@order_router.get("/customer/{customer_id}/history")
+async def get_customer_order_history(
+    customer_id: str,
+    limit: int = Query(20, ge=1, le=100),
+    cursor: Optional[str] = Query(None, description="Continuation token from X-Next-Cursor"),
+):
+    """Newest orders first, as summaries without line items.
+
+    The token for the next page is returned in the `X-Next-Cursor` header;
+    fetch a single order with /orders/detail/{order_id}.
+    """
+    query = {"customer_id": customer_id}
+    if cursor:
+        query = {"$and": [query, keyset_filter(HISTORY_SORT, decode_cursor(cursor, HISTORY_SORT))]}
+
+    # Fetch one extra document to know whether another page exists
+    orders = await orders_collection.aggregate([
+        {"$match": query},
+        {"$sort": dict(HISTORY_SORT)},
+        {"$limit": limit + 1},
+        {"$project": ORDER_SUMMARY_PROJECTION},
+    ]).to_list(None)
+
+    headers = {}
+    if len(orders) > limit:
+        orders = orders[:limit]
+        headers["X-Next-Cursor"] = encode_cursor(orders[-1], HISTORY_SORT)
+    # `_id` was only needed for the cursor
+    for order in orders:
+        del order["_id"]
+    return FastJSONResponse(orders, headers=headers)
+
+
+# ✅ Get a single order with its items
+@order_router.get("/detail/{order_id}", response_model=Order)
+async def get_order_detail(order_id: str):
+    order = await orders_collection.find_one({"order_id": order_id}, ORDER_PROJECTION)
+    if not order:
+        raise HTTPException(status_code=404, detail="Order not found")
+    return FastJSONResponse(order)
+
+
+# ✅ Update the status of many orders at once (OWNER ONLY)
+@order_router.patch("/bulk/status")
+async def bulk_update_order_status(update: OrderStatusBulkUpdate):
+    """Move a list of orders, or every order matching a filter, to a new status.
+
+    Orders whose current status cannot move to the target are left alone and
+    reported per order; the rest change in a single update_many.
+    """
+    if update.status not in ORDER_STATUSES:
+        raise HTTPException(status_code=400, detail="Invalid order status")
+    if update.current_status is not None and update.current_status not in ORDER_STATUSES:
+        raise HTTPException(status_code=400, detail="Invalid current status")
+
+    if update.order_ids:
+        selector = {"order_id": {"$in": update.order_ids}}
+    elif update.current_status or update.start or update.end:
+        selector = {}
+        if update.current_status:
+            selector["status"] = update.current_status
+        if update.start or update.end:
+            selector["created_at"] = {}
+            if update.start:
+                selector["created_at"]["$gte"] = update.start
+            if update.end:
+                selector["created_at"]["$lt"] = update.end
+    else:
+        raise HTTPException(status_code=400, detail="Provide order_ids or a status/date filter")
+
+    sources = [status for status, targets in ORDER_TRANSITIONS.items() if update.status in targets]
+    # One extra document tells a filter that selects too many orders apart from one that fits
+    existing = await orders_collection.find(
+        selector, {"_id": 0, "order_id": 1, "status": 1, "created_at": 1, "total_price": 1, "items": 1}
+    ).to_list(MAX_BULK_ORDERS + 1)
+    if len(existing) > MAX_BULK_ORDERS:
+        raise HTTPException(
+            status_code=400,
+            detail=f"Filter matches more than {MAX_BULK_ORDERS} orders; narrow it by status or date range",
+        )
+
+    results = {}
+    candidates = []
+    for order in existing:
+        if order["status"] in sources:
+            candidates.append(order["order_id"])
+        else:
+            results[order["order_id"]] = {"result": "illegal_transition", "previous_status": order["status"]}
+    for order_id in update.order_ids or []:
+        results.setdefault(order_id, {"result": "not_found"})
+
+    if candidates:
+        now = datetime.utcnow()
+        previous = {order["order_id"]: order for order in existing}
+        # One update per source status, re-checked in the filter: concurrent changes stay
+        # safe and every updated order's previous status is known for the rollups
+        for source in sources:
+            source_ids = [order_id for order_id in candidates if previous[order_id]["status"] == source]
+            if source_ids:
+                await orders_collection.update_many(
+                    {"order_id": {"$in": source_ids}, "status": source},
+                    {"$set": {"status": update.status, "updated_at": now}},
+                )
+        updated = {
+            order["order_id"]
+            for order in await orders_collection.find(
+                {"order_id": {"$in": candidates}, "status": update.status, "updated_at": now},
+                {"_id": 0, "order_id": 1},
+            ).to_list(None)
+        }
+        await record_status_changes([previous[order_id] for order_id in updated], update.status)
+        for order_id in candidates:
+            outcome = "updated" if order_id in updated else "conflict"
+            results[order_id] = {"result": outcome, "previous_status": previous[order_id]["status"]}
+
+    return {
+        "status": update.status,
+        "matched": len(existing),
+        "updated": sum(1 for r in results.values() if r["result"] == "updated"),
+        "results": [{"order_id": order_id, **result} for order_id, result in results.items()],
+    }
 
 
 # ✅ Update order status (OWNER ONLY)
 @order_router.patch("/{order_id}")
 async def update_order_status(order_id: str, status: str = Query(...)):
-    if status not in ["pending", "shipped", "delivered", "cancelled"]:
+    if status not in ORDER_STATUSES:
         raise HTTPException(status_code=400, detail="Invalid order status")
 
-    result = await orders_collection.update_one(
+    # The document as it was before the update tells the rollups which status it left
+    previous = await orders_collection.find_one_and_update(
         {"order_id": order_id},  # ✅ Query by `order_id`, not `_id`
-        {"$set": {"status": status, "updated_at": datetime.utcnow()}}
+        {"$set": {"status": status, "updated_at": datetime.utcnow()}},
+        projection={"_id": 0, "status": 1, "created_at": 1, "total_price": 1, "items": 1},
     )
 
-    if result.modified_count == 0:
+    if previous is None:
         raise HTTPException(status_code=404, detail="Order not found")
+    await record_status_changes([previous], status)
 
     return {"message": "Order status updated successfully"}
 
@@ -1,10 +1,25 @@
-from fastapi import APIRouter, HTTPException, UploadFile, File, Form
-from typing import List
-from models.product import ProductUpdate
-from config.db import products_collection
+from fastapi import APIRouter, HTTPException, UploadFile, File, Form, Query, Request
+from fastapi.responses import StreamingResponse
+from typing import List, Literal, Optional
+from models.product import Product, ProductUpdate
+from config.db import import_jobs_collection, products_collection, products_primary_collection
+from pymongo import ReturnDocument
+from utils.pagination import build_projection, decode_cursor, encode_cursor, keyset_filter
+from utils.cache import cached_response, catalog_cache
+from utils.catalog_sync import CATALOG_SNAPSHOT_ENABLED, catalog_sync
+from utils.images import ImageError
+from utils.media import UploadError, upload_images
+from utils.media_jobs import MEDIA_QUEUE_ENABLED, media_queue, read_images
+from utils.product_import import start_import
+from utils.search import search_index
+from utils.serialization import dumps
+from utils.streaming import ndjson_stream
 from bson import ObjectId
 from datetime import datetime
-import cloudinary.uploader
+import asyncio
+import os
+import shutil
+import tempfile
 
 # Initialize Router
 product_router = APIRouter()
@@ -13,14 +28,140 @@ product_router = APIRouter()
 # Product Endpoints
 # ------------------------------
 
+# Fields a client may request through `fields=`
+PRODUCT_FIELDS = [field.alias or name for name, field in Product.model_fields.items()]
+
+# Sort orders supported by keyset pagination; `_id` is always the tie-breaker
+PRODUCT_SORTS = {
+    "_id": [("_id", 1)],
+    "created_at": [("created_at", 1), ("_id", 1)],
+}
+
+
+def build_product_filter(
+    category: Optional[str],
+    brand: Optional[str],
+    min_price: Optional[float],
+    max_price: Optional[float],
+) -> dict:
+    """Push catalog filters down into the Mongo query."""
+    query = {}
+    if category:
+        query["category"] = category
+    if brand:
+        query["brand"] = brand
+    if min_price is not None or max_price is not None:
+        query["price"] = {}
+        if min_price is not None:
+            query["price"]["$gte"] = min_price
+        if max_price is not None:
+            query["price"]["$lte"] = max_price
+    return query
+
+
+def product_predicate(
+    category: Optional[str],
+    brand: Optional[str],
+    min_price: Optional[float],
+    max_price: Optional[float],
+):
+    """In-memory equivalent of build_product_filter, for snapshot reads."""
+    def matches(product):
+        if category and product.get("category") != category:
+            return False
+        if brand and product.get("brand") != brand:
+            return False
+        price = product.get("price")
+        if min_price is not None and (price is None or price < min_price):
+            return False
+        if max_price is not None and (price is None or price > max_price):
+            return False
+        return True
+    return matches
+
+
 @product_router.get("/products")
-async def get_products():
-    """Retrieve all products with full details."""
-    products = [
-        {**product, "_id": str(product["_id"])}  # Convert ObjectId to string
-        for product in await products_collection.find({}).to_list(length=100)
-    ]
-    return products
+async def get_products(
+    request: Request,
+    limit: int = Query(100, ge=1, le=1000),
+    cursor: Optional[str] = Query(None, description="Continuation token from X-Next-Cursor"),
+    sort: Literal["_id", "created_at"] = "_id",
+    fields: Optional[str] = Query(None, description="Comma-separated list of fields to return"),
+    category: Optional[str] = None,
+    brand: Optional[str] = None,
+    min_price: Optional[float] = Query(None, ge=0),
+    max_price: Optional[float] = Query(None, ge=0),
+    stream: bool = Query(False, description="Stream every matching product as NDJSON"),
+):
+    """Retrieve products page by page using keyset pagination.
+
+    The token for the next page is returned in the `X-Next-Cursor` header.
+    With `stream=true` every product after `cursor` is sent as NDJSON.
+    Pages are cached until a product changes and carry an ETag.
+    """
+    cache_key = (limit, cursor, sort, fields, category, brand, min_price, max_price)
+    if not stream:
+        entry = catalog_cache.lookup("products", cache_key)
+        if entry:
+            return cached_response(request, entry)
+    version = catalog_cache.version("products")
+
+    sort_spec = PRODUCT_SORTS[sort]
+    sort_fields = [f for f, _ in sort_spec]
+    after = decode_cursor(cursor, sort_spec) if cursor else None
+
+    projection = None
+    if fields:
+        projection = build_projection(fields, PRODUCT_FIELDS, required=sort_fields)
+
+    use_snapshot = CATALOG_SNAPSHOT_ENABLED and catalog_sync.products.ready
+
+    def serialize(product):
+        # Snapshot documents carry every field; Mongo already applied the projection
+        if projection and use_snapshot:
+            return {k: v for k, v in product.items() if k in projection or k == "_id"}
+        return product  # ObjectId is handled by the encoder
+
+    if use_snapshot and not stream:
+        # Fetch one extra document to know whether another page exists
+        predicate = product_predicate(category, brand, min_price, max_price)
+        products = catalog_sync.products.page(sort_fields, after, predicate, limit + 1)
+    else:
+        query = build_product_filter(category, brand, min_price, max_price)
+        if after:
+            query = {"$and": [query, keyset_filter(sort_spec, after)]}
+
+        if stream:
+            db_cursor = products_collection.find(query, projection, sort=sort_spec, batch_size=limit)
+            return StreamingResponse(ndjson_stream(db_cursor, serialize), media_type="application/x-ndjson")
+
+        # Fetch one extra document to know whether another page exists. The page is cached
+        # under the current version, so it must not come from a lagging secondary.
+        products = await products_primary_collection.find(query, projection, sort=sort_spec).to_list(
+            length=limit + 1
+        )
+
+    headers = {}
+    if len(products) > limit:
+        products = products[:limit]
+        headers["X-Next-Cursor"] = encode_cursor(products[-1], sort_spec)
+
+    body = dumps([serialize(product) for product in products])
+    entry = catalog_cache.store("products", cache_key, version, body, headers)
+    return cached_response(request, entry)
+
+
+@product_router.get("/search")
+async def search_products(
+    q: str = Query("", max_length=200, description="Search text; the last word matches as a prefix"),
+    category: Optional[str] = None,
+    brand: Optional[str] = None,
+    min_price: Optional[float] = Query(None, ge=0),
+    max_price: Optional[float] = Query(None, ge=0),
+    limit: int = Query(10, ge=1, le=100),
+):
+    """Typeahead search with facet counts, answered from the in-memory index."""
+    return search_index.search(q, category, brand, min_price, max_price, limit)
 
 
 @product_router.post("/products")
@@ -37,14 +178,17 @@ async def create_product(
     # Cloudinary folder for product images
     cloudinary_folder = f"ph-products/{name.replace(' ', '-')}"  # Avoid spaces in folder names
 
-    # Upload multiple images to Cloudinary
-    image_urls = []
-    for image in images:
-        try:
-            result = cloudinary.uploader.upload(image.file, folder=cloudinary_folder)
-            image_urls.append(result["secure_url"])
-        except Exception as e:
-            raise HTTPException(status_code=500, detail=f"Cloudinary upload failed: {str(e)}")
+    if MEDIA_QUEUE_ENABLED:
+        return await create_product_queued(name, price, quantity, category, brand, images, cloudinary_folder)
+
+    # Resize into thumbnail/card/full WebP+JPEG variants, then upload them concurrently
+    try:
+        image_variants = await upload_images([image.file for image in images], cloudinary_folder)
+    except ImageError as e:
+        raise HTTPException(status_code=400, detail=f"Invalid image: {str(e)}")
+    except UploadError as e:
+        raise HTTPException(status_code=500, detail=f"Cloudinary upload failed: {str(e)}")
+    image_urls = [variants["full"]["jpeg"] for variants in image_variants]
 
     # Prepare product data
     product_data = {
@@ -52,6 +196,7 @@ async def create_product(
         "price": price,
         "quantity": quantity,
         "images": image_urls,  # Store multiple image URLs
+        "image_variants": image_variants,
         "category": category,
         "brand": brand,
         "created_at": datetime.utcnow().isoformat(),
@@ -59,7 +204,99 @@ async def create_product(
     }
 
     result = await products_collection.insert_one(product_data)
-    return {"_id": str(result.inserted_id), "image_urls": image_urls}
+    catalog_cache.invalidate("products")
+    search_index.add(product_data)  # insert_one set product_data["_id"]
+    return {"_id": str(result.inserted_id), "image_urls": image_urls, "image_variants": image_variants}
+
+
+async def create_product_queued(name, price, quantity, category, brand, images, cloudinary_folder):
+    """Insert the product right away and leave the image uploads to the media queue."""
+    try:
+        datas = await read_images([image.file for image in images])
+    except ImageError as e:
+        raise HTTPException(status_code=400, detail=f"Invalid image: {str(e)}")
+
+    job_id = ObjectId()
+    product_data = {
+        "name": name,
+        "price": price,
+        "quantity": quantity,
+        "images": [],
+        "image_variants": [],
+        "images_status": "pending",  # Set to "ready" (or "failed") by the media queue
+        "media_job_id": job_id,
+        "category": category,
+        "brand": brand,
+        "created_at": datetime.utcnow().isoformat(),
+        "updated_at": datetime.utcnow().isoformat(),
+    }
+
+    result = await products_collection.insert_one(product_data)
+    try:
+        await media_queue.enqueue(job_id, "products", result.inserted_id, cloudinary_folder, datas)
+    except Exception as e:
+        await products_collection.delete_one({"_id": result.inserted_id})
+        raise HTTPException(status_code=500, detail=f"Could not queue image upload: {str(e)}")
+
+    catalog_cache.invalidate("products")
+    search_index.add(product_data)
+    return {
+        "_id": str(result.inserted_id),
+        "images_status": "pending",
+        "media_job_id": str(job_id),
+        "status_url": f"/media/jobs/{job_id}",
+    }
+
+
+@product_router.post("/products/import", status_code=202)
+async def import_products(
+    file: UploadFile = File(...),
+    format: Optional[Literal["csv", "ndjson"]] = Query(None, description="Defaults to the file extension"),
+):
+    """Bulk import products from CSV or NDJSON; rows with a `sku` are upserted by SKU.
+
+    The upload is spooled to disk and processed in the background. Poll the
+    returned status URL for progress and per-row errors.
+    """
+    file_format = format or ("csv" if (file.filename or "").lower().endswith(".csv") else "ndjson")
+
+    spool = tempfile.NamedTemporaryFile(prefix="product-import-", delete=False)
+    job = {
+        "status": "queued",
+        "format": file_format,
+        "filename": file.filename,
+        "processed": 0,
+        "inserted": 0,
+        "upserted": 0,
+        "updated": 0,
+        "failed": 0,
+        "errors": [],
+        "created_at": datetime.utcnow(),
+    }
+    try:
+        with spool:
+            await asyncio.to_thread(shutil.copyfileobj, file.file, spool)
+        result = await import_jobs_collection.insert_one(job)
+    except Exception:
+        # From here on run_import owns the spool and deletes it
+        os.unlink(spool.name)
+        raise
+    start_import(result.inserted_id, spool.name, file_format)
+
+    job_id = str(result.inserted_id)
+    return {"job_id": job_id, "status_url": f"/products/products/import/{job_id}"}
+
+
+@product_router.get("/products/import/{job_id}")
+async def get_import_status(job_id: str):
+    """Progress and row errors of a bulk import."""
+    if not ObjectId.is_valid(job_id):
+        raise HTTPException(status_code=400, detail="Invalid Job ID")
+
+    job = await import_jobs_collection.find_one({"_id": ObjectId(job_id)})
+    if not job:
+        raise HTTPException(status_code=404, detail="Import job not found")
+    return {**job, "_id": str(job["_id"])}
 
 
 @product_router.put("/products/{product_id}")
@@ -77,12 +314,14 @@ async def update_product(product_id: str, product: ProductUpdate):
 
     product_dict["updated_at"] = datetime.utcnow().isoformat()
 
-    result = await products_collection.update_one(
-        {"_id": ObjectId(product_id)}, {"$set": product_dict}
+    updated = await products_collection.find_one_and_update(
+        {"_id": ObjectId(product_id)}, {"$set": product_dict}, return_document=ReturnDocument.AFTER
     )
 
-    if result.matched_count == 0:
+    if updated is None:
         raise HTTPException(status_code=404, detail="Product not found")
+    catalog_cache.invalidate("products")
+    search_index.add(updated)
 
     return {"message": "Product updated successfully"}
 
@@ -96,5 +335,7 @@ async def delete_product(product_id: str):
     result = await products_collection.delete_one({"_id": ObjectId(product_id)})
     if result.deleted_count == 0:
         raise HTTPException(status_code=404, detail="Product not found")
+    catalog_cache.invalidate("products")
+    search_index.remove(product_id)
 
     return {"message": "Product deleted successfully"}
@@ -0,0 +1,206 @@
+import asyncio
+import math
+import os
+import time
+from collections import OrderedDict
+from dataclasses import dataclass, field
+from fnmatch import fnmatchcase
+from typing import Dict, List, Optional, Tuple
+
+from fastapi import HTTPException
+from starlette.requests import Request
+from starlette.responses import JSONResponse
+
+from utils.auth import require_customer, require_owner
+from utils.metrics import admission_rejections
+
+# Set ADMISSION_CONTROL=0 to disable rate limiting and load shedding entirely
+ADMISSION_ENABLED = os.getenv("ADMISSION_CONTROL", "1") == "1"
+# Trusted proxies in front of the app that append to X-Forwarded-For. Leave at 0 (use
+# the socket address) unless such a proxy exists: otherwise clients can forge the
+# header and get a fresh bucket per request. Behind one load balancer, set it to 1.
+ADMISSION_FORWARDED_HOPS = int(os.getenv("ADMISSION_FORWARDED_HOPS", "0"))
+# Token buckets remembered per prefix; the least recently seen client is dropped beyond this
+ADMISSION_CLIENTS = int(os.getenv("ADMISSION_CLIENTS", "100000"))
+
+
+@dataclass
+class AdmissionPolicy:
+    """Limits for every route under one router prefix.
+
+    `rate`/`burst` size a token bucket per client (customer id from a valid
+    bearer token, otherwise the client IP); rate 0 disables it. `concurrency`
+    maps "METHOD /path" patterns (relative to the prefix, fnmatch-style) to the
+    number of such requests allowed in flight. Requests over that limit queue,
+    unless the queue is full or its expected wait exceeds `max_wait` seconds.
+    """
+
+    rate: float = 0
+    burst: float = 0
+    concurrency: Dict[str, int] = field(default_factory=dict)
+    max_queue: int = 32
+    max_wait: float = 2.0
+
+
+class RejectedRequest(Exception):
+    def __init__(self, status_code: int, reason: str, retry_after: float):
+        self.status_code = status_code
+        self.reason = reason
+        self.retry_after = max(1, math.ceil(retry_after))
+
+
+class TokenBuckets:
+    """Per-client token buckets in a bounded LRU."""
+
+    def __init__(self, rate: float, burst: float, size: int = ADMISSION_CLIENTS):
+        self.rate = rate
+        self.burst = max(burst, 1.0)
+        self.size = size
+        self._buckets: "OrderedDict[str, Tuple[float, float]]" = OrderedDict()  # key -> (tokens, updated)
+
+    def take(self, key: str):
+        now = time.monotonic()
+        tokens, updated = self._buckets.get(key, (self.burst, now))
+        tokens = min(self.burst, tokens + (now - updated) * self.rate)
+        if tokens < 1:
+            self._buckets[key] = (tokens, now)
+            raise RejectedRequest(429, "rate_limited", (1 - tokens) / self.rate)
+        self._buckets[key] = (tokens - 1, now)
+        self._buckets.move_to_end(key)
+        if len(self._buckets) > self.size:
+            self._buckets.popitem(last=False)
+
+
+class ConcurrencyLimit:
+    """Caps in-flight requests for one route and sheds load once queueing would blow the budget.
+
+    The expected wait is estimated from the queue length and a moving average
+    of how long admitted requests take, so a queue that cannot drain within
+    `max_wait` is refused at once instead of after the client has waited.
+    """
+
+    def __init__(self, limit: int, max_queue: int, max_wait: float):
+        self.limit = limit
+        self.max_queue = max_queue
+        self.max_wait = max_wait
+        self.waiting = 0
+        self.avg_service = 0.0  # Seconds, exponentially weighted
+        self._semaphore = asyncio.Semaphore(limit)
+
+    def expected_wait(self) -> float:
+        return (self.waiting + 1) / self.limit * self.avg_service
+
+    async def acquire(self):
+        if self._semaphore.locked():
+            expected = self.expected_wait()
+            if self.waiting >= self.max_queue or expected > self.max_wait:
+                raise RejectedRequest(503, "overloaded", expected)
+            self.waiting += 1
+            try:
+                await asyncio.wait_for(self._semaphore.acquire(), self.max_wait)
+            except asyncio.TimeoutError:
+                raise RejectedRequest(503, "queue_timeout", self.expected_wait()) from None
+            finally:
+                self.waiting -= 1
+        else:
+            await self._semaphore.acquire()
+
+    def release(self, elapsed: float):
+        self.avg_service = elapsed if not self.avg_service else 0.8 * self.avg_service + 0.2 * elapsed
+        self._semaphore.release()
+
+
+class _PrefixLimits:
+    def __init__(self, prefix: str, policy: AdmissionPolicy):
+        self.prefix = prefix
+        self.buckets = TokenBuckets(policy.rate, policy.burst or policy.rate) if policy.rate > 0 else None
+        self.routes: List[Tuple[str, str, ConcurrencyLimit]] = []
+        for pattern, limit in policy.concurrency.items():
+            method, _, path = pattern.partition(" ")
+            self.routes.append((method.upper(), path, ConcurrencyLimit(limit, policy.max_queue, policy.max_wait)))
+
+    def route_limit(self, method: str, path: str) -> Optional[ConcurrencyLimit]:
+        for route_method, pattern, limit in self.routes:
+            if route_method == method and fnmatchcase(path, pattern):
+                return limit
+        return None
+
+
+def client_key(request: Request) -> str:
+    """Customer (or owner) identity from a valid bearer token, else the client IP.
+
+    Invalid tokens count against the IP, so made-up tokens cannot mint fresh buckets.
+    """
+    scheme, _, token = request.headers.get("authorization", "").partition(" ")
+    if scheme.lower() == "bearer" and token:
+        for verifier in (require_customer, require_owner):
+            try:
+                sub = verifier.verify(token)["sub"]
+            except HTTPException:
+                continue
+            if verifier is require_owner:
+                return "owner"
+            return f"customer:{sub.get('customer_id') if isinstance(sub, dict) else sub}"
+
+    if ADMISSION_FORWARDED_HOPS > 0:
+        forwarded = [ip.strip() for ip in request.headers.get("x-forwarded-for", "").split(",") if ip.strip()]
+        if forwarded:
+            # Entries left of the ones our own proxies appended can be forged by the client
+            return f"ip:{forwarded[-min(ADMISSION_FORWARDED_HOPS, len(forwarded))]}"
+    return f"ip:{request.client.host if request.client else 'unknown'}"
+
+
+class AdmissionMiddleware:
+    """ASGI middleware applying AdmissionPolicy limits keyed by router prefix.
+
+    The longest matching prefix wins; "" covers routes registered without one.
+    Rejections are JSON errors like HTTPException's, with a Retry-After header.
+    """
+
+    def __init__(self, app, policies: Dict[str, AdmissionPolicy]):
+        self.app = app
+        # Longest prefix first, so "/products" is checked before ""
+        self.limits = [_PrefixLimits(prefix.rstrip("/"), policy) for prefix, policy in policies.items()]
+        self.limits.sort(key=lambda limits: -len(limits.prefix))
+
+    def _match(self, path: str) -> Optional[_PrefixLimits]:
+        for limits in self.limits:
+            if not limits.prefix or path == limits.prefix or path.startswith(limits.prefix + "/"):
+                return limits
+        return None
+
+    async def __call__(self, scope, receive, send):
+        # CORS preflights are answered by CORSMiddleware and cost nothing
+        if not ADMISSION_ENABLED or scope["type"] != "http" or scope["method"] == "OPTIONS":
+            await self.app(scope, receive, send)
+            return
+
+        limits = self._match(scope["path"])
+        if limits is None:
+            await self.app(scope, receive, send)
+            return
+
+        route_limit = limits.route_limit(scope["method"], scope["path"][len(limits.prefix):])
+        try:
+            if limits.buckets is not None:
+                limits.buckets.take(client_key(Request(scope)))
+            if route_limit is not None:
+                await route_limit.acquire()
+        except RejectedRequest as rejected:
+            admission_rejections.inc(limits.prefix or "/", rejected.reason)
+            detail = "Too many requests" if rejected.status_code == 429 else "Server is busy, please retry"
+            response = JSONResponse(
+                {"detail": detail}, status_code=rejected.status_code, headers={"Retry-After": str(rejected.retry_after)}
+            )
+            await response(scope, receive, send)
+            return
+
+        if route_limit is None:
+            await self.app(scope, receive, send)
+            return
+        # Held until the response body is sent, so streamed exports count for their whole duration
+        started = time.monotonic()
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            route_limit.release(time.monotonic() - started)
@@ -0,0 +1,102 @@
+import datetime
+import os
+import time
+from collections import OrderedDict
+from typing import Any, Dict, Optional, Tuple
+
+import jwt
+from dotenv import load_dotenv
+from fastapi import Depends, HTTPException
+from fastapi.security import HTTPAuthorizationCredentials, HTTPBearer
+
+# Load environment variables
+load_dotenv()
+
+# ✅ JWT Secrets & Algorithm (customer and owner tokens are signed with different keys)
+ALGORITHM = "HS256"
+CUSTOMER_SECRET_KEY = os.getenv("CUSTOMER_SECRET_KEY", "your_secret_key")  # Change this in production
+OWNER_SECRET_KEY = os.getenv("SECRET_KEY", "your_default_secret_key")
+TOKEN_LIFETIME = datetime.timedelta(hours=24)
+
+# Verified tokens remembered per scope
+TOKEN_CACHE_SIZE = int(os.getenv("TOKEN_CACHE_SIZE", "10000"))
+
+SCOPE_KEYS = {
+    "customer": CUSTOMER_SECRET_KEY.encode(),
+    "owner": OWNER_SECRET_KEY.encode(),
+}
+
+_bearer = HTTPBearer(auto_error=False)
+
+
+def create_jwt_token(data: dict, scope: str) -> str:
+    """Generate a JWT token for the given scope ("customer" or "owner")."""
+    now = datetime.datetime.utcnow()
+    payload = {
+        "exp": now + TOKEN_LIFETIME,
+        "iat": now,
+        "sub": data,
+        "scope": scope,
+    }
+    return jwt.encode(payload, SCOPE_KEYS[scope], algorithm=ALGORITHM)
+
+
+class TokenVerifier:
+    """FastAPI dependency that verifies bearer tokens for one scope.
+
+    Decoded claims are kept in a bounded LRU keyed by the raw token until the
+    token's `exp`, so repeat requests skip the HMAC check and JSON decoding.
+    Returns the token's `sub` claim.
+    """
+
+    def __init__(self, scope: str, key: bytes, maxsize: int = TOKEN_CACHE_SIZE):
+        self.scope = scope
+        self.key = key  # Pre-encoded once instead of on every decode
+        self.maxsize = maxsize
+        self._cache: "OrderedDict[str, Tuple[Dict[str, Any], float]]" = OrderedDict()
+
+    def _unauthorized(self, detail: str) -> HTTPException:
+        return HTTPException(status_code=401, detail=detail, headers={"WWW-Authenticate": "Bearer"})
+
+    def verify(self, token: str) -> Dict[str, Any]:
+        cached = self._cache.get(token)
+        if cached is not None:
+            claims, expires_at = cached
+            if time.time() < expires_at:
+                self._cache.move_to_end(token)
+                return claims
+            del self._cache[token]
+            raise self._unauthorized("Token has expired")
+
+        try:
+            claims = jwt.decode(
+                token,
+                self.key,
+                algorithms=[ALGORITHM],
+                options={"require": ["exp"], "verify_sub": False},  # `sub` is an object here
+            )
+        except jwt.ExpiredSignatureError:
+            raise self._unauthorized("Token has expired")
+        except jwt.InvalidTokenError:
+            raise self._unauthorized("Invalid token")
+
+        # Tokens issued before scopes existed are identified by their signing key alone
+        if claims.get("scope", self.scope) != self.scope:
+            raise self._unauthorized("Token has the wrong scope")
+
+        self._cache[token] = (claims, float(claims["exp"]))
+        if len(self._cache) > self.maxsize:
+            self._cache.popitem(last=False)
+        return claims
+
+    async def __call__(
+        self, credentials: Optional[HTTPAuthorizationCredentials] = Depends(_bearer)
+    ) -> Dict[str, Any]:
+        if credentials is None:
+            raise self._unauthorized("Not authenticated")
+        return self.verify(credentials.credentials)["sub"]
+
+
+# ✅ Dependencies for routers: `Depends(require_customer)` / `Depends(require_owner)`
+require_customer = TokenVerifier("customer", SCOPE_KEYS["customer"])
+require_owner = TokenVerifier("owner", SCOPE_KEYS["owner"])
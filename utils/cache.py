@@ -0,0 +1,171 @@
+import gzip
+import hashlib
+import os
+import time
+from collections import OrderedDict
+from dataclasses import dataclass, field
+from typing import Dict, Hashable, Optional
+
+import brotli
+from fastapi import Request, Response
+
+from utils.metrics import cached_responses
+
+# Seconds a cached catalog response may be served without touching MongoDB
+CATALOG_CACHE_TTL = float(os.getenv("CATALOG_CACHE_TTL", "300"))
+# Maximum number of cached responses across all namespaces
+CATALOG_CACHE_SIZE = int(os.getenv("CATALOG_CACHE_SIZE", "512"))
+# Bodies smaller than this many bytes are only kept uncompressed
+COMPRESS_MIN_SIZE = int(os.getenv("COMPRESS_MIN_SIZE", "1024"))
+# Each body is compressed once per version, on the event loop: keep Brotli below its slow levels 10-11
+BROTLI_QUALITY = int(os.getenv("BROTLI_QUALITY", "6"))
+GZIP_LEVEL = int(os.getenv("GZIP_LEVEL", "9"))
+
+# Content codings in order of preference when the client accepts several equally
+ENCODERS = {
+    "br": lambda body: brotli.compress(body, quality=BROTLI_QUALITY),
+    "gzip": lambda body: gzip.compress(body, compresslevel=GZIP_LEVEL, mtime=0),
+}
+
+
+@dataclass
+class CachedBody:
+    body: bytes
+    etag: str
+    expires_at: float
+    headers: Dict[str, str] = field(default_factory=dict)
+    encodings: Dict[str, bytes] = field(default_factory=dict)  # Content-Encoding -> compressed body
+
+    def etag_for(self, encoding: str) -> str:
+        """Each encoding is a separate representation and needs its own strong ETag."""
+        return self.etag if encoding == "identity" else f'{self.etag[:-1]}-{encoding}"'
+
+
+def compress_body(body: bytes) -> Dict[str, bytes]:
+    """Every configured encoding of `body`, leaving out ones that do not make it smaller."""
+    if len(body) < COMPRESS_MIN_SIZE:
+        return {}
+    encodings = {}
+    for encoding, encode in ENCODERS.items():
+        compressed = encode(body)
+        if len(compressed) < len(body):
+            encodings[encoding] = compressed
+    return encodings
+
+
+class VersionedCache:
+    """LRU + TTL cache of serialized response bodies, grouped into namespaces.
+
+    Every namespace has a version number that mutating handlers bump through
+    `invalidate()`. Readers capture the version before querying the database
+    and pass it to `store()`, so a response computed from pre-invalidation
+    data is never cached under the new version. Bodies are compressed when
+    stored, so hits serve gzip/Brotli without compressing again.
+    """
+
+    def __init__(self, maxsize: int, ttl: float):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._entries: "OrderedDict[tuple, CachedBody]" = OrderedDict()
+        self._versions: Dict[str, int] = {}
+        self.hits = 0
+        self.misses = 0
+
+    def version(self, namespace: str) -> int:
+        return self._versions.get(namespace, 0)
+
+    def lookup(self, namespace: str, key: Hashable) -> Optional[CachedBody]:
+        full_key = (namespace, self.version(namespace), key)
+        entry = self._entries.get(full_key)
+        if entry is None or entry.expires_at < time.monotonic():
+            if entry is not None:
+                del self._entries[full_key]
+            self.misses += 1
+            return None
+        self._entries.move_to_end(full_key)
+        self.hits += 1
+        return entry
+
+    def store(
+        self,
+        namespace: str,
+        key: Hashable,
+        version: int,
+        body: bytes,
+        headers: Optional[Dict[str, str]] = None,
+    ) -> CachedBody:
+        """Cache a body computed at `version`; stale versions are returned but not kept.
+
+        Only bodies that will be kept are compressed: a stale one is served once,
+        uncompressed, rather than paying for brotli and gzip on a throwaway.
+        """
+        entry = CachedBody(
+            body=body,
+            etag='"' + hashlib.blake2b(body, digest_size=16).hexdigest() + '"',
+            expires_at=time.monotonic() + self.ttl,
+            headers=headers or {},
+        )
+        if version == self.version(namespace):
+            entry.encodings = compress_body(body)
+            self._entries[(namespace, version, key)] = entry
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+        return entry
+
+    def invalidate(self, namespace: str):
+        """Drop every cached response in a namespace."""
+        self._versions[namespace] = self.version(namespace) + 1
+        for full_key in [k for k in self._entries if k[0] == namespace]:
+            del self._entries[full_key]
+
+
+def etag_matches(request: Request, etag: str) -> bool:
+    """Strong comparison of an ETag against the request's If-None-Match header."""
+    header = request.headers.get("if-none-match")
+    if not header:
+        return False
+    candidates = [tag.strip() for tag in header.split(",")]
+    return "*" in candidates or etag in candidates
+
+
+def choose_encoding(request: Request, available) -> str:
+    """Pick the stored encoding with the highest Accept-Encoding q-value, else identity."""
+    header = request.headers.get("accept-encoding")
+    if not header:
+        return "identity"
+    weights: Dict[str, float] = {}
+    for part in header.split(","):
+        coding, _, params = part.strip().partition(";")
+        q = 1.0
+        params = params.strip()
+        if params.startswith("q="):
+            try:
+                q = float(params[2:])
+            except ValueError:
+                q = 0.0
+        weights[coding.strip().lower()] = q
+    best, best_q = "identity", 0.0
+    for encoding in available:  # ENCODERS order breaks ties
+        q = weights.get(encoding, weights.get("*", 0.0))
+        if q > best_q:
+            best, best_q = encoding, q
+    return best
+
+
+def cached_response(request: Request, entry: CachedBody) -> Response:
+    """Serve a cached body in the client's preferred encoding, or 304 if it already has it."""
+    encoding = choose_encoding(request, entry.encodings)
+    etag = entry.etag_for(encoding)
+    headers = {"ETag": etag, "Cache-Control": "no-cache", **entry.headers}
+    if entry.encodings:
+        headers["Vary"] = "Accept-Encoding"
+    if etag_matches(request, etag):
+        return Response(status_code=304, headers=headers)
+    cached_responses.inc(encoding)
+    if encoding == "identity":
+        return Response(content=entry.body, media_type="application/json", headers=headers)
+    headers["Content-Encoding"] = encoding
+    return Response(content=entry.encodings[encoding], media_type="application/json", headers=headers)
+
+
+catalog_cache = VersionedCache(CATALOG_CACHE_SIZE, CATALOG_CACHE_TTL)
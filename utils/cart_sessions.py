@@ -0,0 +1,278 @@
+import asyncio
+import os
+import time
+from collections import OrderedDict
+from contextlib import asynccontextmanager
+from datetime import datetime
+from typing import Any, Dict, Optional
+
+from bson import ObjectId
+from fastapi import HTTPException
+from pymongo.errors import PyMongoError
+
+from config.db import cart_collection
+from utils.metrics import cart_session_mutations, cart_session_writes
+
+# Set CART_SESSIONS=1 to keep active carts in memory and coalesce their writes.
+# Requires sticky routing: every request for a customer_id must reach the same
+# worker process (the default single-process uvicorn deployment satisfies this).
+# With several workers, route on the customer id in the path at the load balancer.
+CART_SESSIONS_ENABLED = os.getenv("CART_SESSIONS", "0") == "1"
+# Carts kept in memory; the least recently used one is flushed and dropped beyond this
+CART_SESSION_SIZE = int(os.getenv("CART_SESSION_SIZE", "10000"))
+# Seconds after the first unflushed change before the cart is written back
+CART_FLUSH_DELAY = float(os.getenv("CART_FLUSH_DELAY", "1.0"))
+# Clean carts older than this are re-read, picking up writes made elsewhere
+CART_SESSION_TTL = float(os.getenv("CART_SESSION_TTL", "60"))
+
+
+class CartSession:
+    """One customer's cart as held in memory; `doc` is None when there is no cart."""
+
+    def __init__(self, customer_id: ObjectId, doc: Optional[dict]):
+        self.customer_id = customer_id
+        self.doc = doc
+        self.loaded_at = time.monotonic()
+        self.dirty = False
+        self.write_lock = asyncio.Lock()  # Held while this cart is being written back
+        self.flush_handle: Optional[asyncio.TimerHandle] = None
+
+    def ensure_doc(self, now: str) -> bool:
+        """Create an empty cart if there is none; returns True if it did."""
+        if self.doc is not None:
+            return False
+        self.doc = {"customer_id": self.customer_id, "items": [], "total_price": 0.0, "created_at": now}
+        return True
+
+    def touch(self, now: str):
+        """Recompute total_price after the items changed."""
+        self.doc["updated_at"] = now
+        self.doc["total_price"] = sum(item["price"] * item["quantity"] for item in self.doc["items"])
+
+    def find_item(self, product_id: str) -> Optional[dict]:
+        if self.doc is None:
+            return None
+        return next((item for item in self.doc["items"] if item["product_id"] == product_id), None)
+
+
+class CartSessionStore:
+    """Bounded LRU of cart sessions with debounced write-back to `carts`.
+
+    Mutations change the in-memory document and schedule one flush
+    CART_FLUSH_DELAY seconds after the first unflushed change, so a burst of
+    quantity clicks costs a single replace_one. Misses read through to Mongo.
+    Carts are flushed when evicted, before checkout and order creation, and
+    on shutdown; a failed flush keeps the cart dirty and is retried. A cart
+    stays reachable in `_flushing` until its write lands, so a request that
+    arrives meanwhile resumes the in-memory cart instead of reading the
+    pre-flush document from Mongo. While a checkout holds a cart, changes
+    to it are refused with 409 instead of being accepted and then lost.
+    """
+
+    def __init__(self, size: int = CART_SESSION_SIZE, flush_delay: float = CART_FLUSH_DELAY):
+        self.size = size
+        self.flush_delay = flush_delay
+        self._sessions: "OrderedDict[ObjectId, CartSession]" = OrderedDict()
+        self._loading: Dict[ObjectId, asyncio.Future] = {}
+        self._flushing: Dict[ObjectId, CartSession] = {}  # Dropped from _sessions, write not yet landed
+        self._checkouts: Dict[ObjectId, int] = {}  # Customers with a checkout in flight -> how many
+        self._flushes = set()
+
+    def __len__(self):
+        return len(self._sessions)
+
+    async def get(self, customer_id: ObjectId) -> CartSession:
+        session = self._sessions.get(customer_id)
+        if session is None:
+            session = self._flushing.get(customer_id)
+            if session is not None:
+                self._sessions[customer_id] = session  # Newer than what Mongo has until the flush lands
+        if session is not None and (
+            session.dirty or session.write_lock.locked() or time.monotonic() - session.loaded_at < CART_SESSION_TTL
+        ):
+            self._sessions.move_to_end(customer_id)
+            return session
+
+        # Concurrent misses for the same customer share one read
+        loading = self._loading.get(customer_id)
+        if loading is None:
+            loading = asyncio.ensure_future(cart_collection.find_one({"customer_id": customer_id}))
+            self._loading[customer_id] = loading
+            loading.add_done_callback(lambda _: self._loading.pop(customer_id, None))
+        doc = await asyncio.shield(loading)
+
+        session = self._sessions.get(customer_id) or self._flushing.get(customer_id)
+        if session is None or not (session.dirty or session.write_lock.locked()):
+            session = CartSession(customer_id, doc)
+        self._sessions[customer_id] = session
+        self._sessions.move_to_end(customer_id)
+
+        while len(self._sessions) > self.size:
+            _, evicted = self._sessions.popitem(last=False)
+            if evicted.dirty or evicted.write_lock.locked():
+                # Written in the background: this request need not wait for another customer's cart
+                self._flush_in_background(evicted, "eviction")
+        return session
+
+    def changed(self, session: CartSession):
+        """Record a mutation and make sure a flush is scheduled."""
+        cart_session_mutations.inc()
+        self._mark_dirty(session)
+
+    def _mark_dirty(self, session: CartSession):
+        session.dirty = True
+        if session.flush_handle is None:
+            session.flush_handle = asyncio.get_running_loop().call_later(
+                self.flush_delay, self._schedule_flush, session
+            )
+
+    def _schedule_flush(self, session: CartSession):
+        session.flush_handle = None
+        self._flush_in_background(session, "debounce")
+
+    def _flush_in_background(self, session: CartSession, reason: str):
+        self._flushing[session.customer_id] = session
+        task = asyncio.ensure_future(self._flush(session, reason))
+        self._flushes.add(task)
+
+        def done(_):
+            self._flushes.discard(task)
+            self._flushed(session)
+
+        task.add_done_callback(done)
+
+    def _flushed(self, session: CartSession):
+        # A failed write leaves the cart dirty; it stays reachable until the retry lands
+        if not session.dirty and self._flushing.get(session.customer_id) is session:
+            del self._flushing[session.customer_id]
+
+    async def _flush(self, session: CartSession, reason: str):
+        if session.flush_handle is not None:
+            session.flush_handle.cancel()
+            session.flush_handle = None
+        # Waiting for the lock also means a caller never returns while an earlier write is in flight
+        async with session.write_lock:
+            if not session.dirty:
+                return
+            session.dirty = False
+            # Copy the items too: later mutations must not alter the document being written
+            doc = None if session.doc is None else {**session.doc, "items": [dict(i) for i in session.doc["items"]]}
+            try:
+                if doc is None:
+                    await cart_collection.delete_one({"customer_id": session.customer_id})
+                else:
+                    result = await cart_collection.replace_one({"customer_id": session.customer_id}, doc, upsert=True)
+                    if result.upserted_id is not None and session.doc is not None:
+                        session.doc.setdefault("_id", result.upserted_id)
+                cart_session_writes.inc(reason)
+            except PyMongoError as e:
+                print(f"⚠️ Could not flush cart {session.customer_id}: {e}")
+                self._mark_dirty(session)  # Retry after another debounce window
+
+    async def flush(self, customer_id: ObjectId, reason: str = "checkout"):
+        """Write a cart back now if it has unflushed changes."""
+        session = self._sessions.get(customer_id) or self._flushing.get(customer_id)
+        if session is not None:
+            await self._flush(session, reason)
+
+    async def evict(self, customer_id: ObjectId, reason: str = "checkout"):
+        """Flush a cart and forget it, so the next access reads it from Mongo."""
+        session = self._sessions.pop(customer_id, None) or self._flushing.get(customer_id)
+        if session is not None:
+            self._flushing[customer_id] = session
+            try:
+                await self._flush(session, reason)
+            finally:
+                self._flushed(session)
+
+    def discard(self, customer_id: ObjectId):
+        """Forget a cart without writing it, e.g. after checkout deleted it in Mongo."""
+        evicted = self._flushing.pop(customer_id, None)
+        session = self._sessions.pop(customer_id, None) or evicted
+        if session is not None and session.flush_handle is not None:
+            session.flush_handle.cancel()
+            session.flush_handle = None
+
+    @asynccontextmanager
+    async def checkout(self, customer_id: ObjectId):
+        """Hold a cart for checkout: flush it, refuse changes meanwhile, then forget it.
+
+        Checkout deletes the cart in Mongo, so a change accepted while it runs
+        would either be dropped or bring the checked-out cart back.
+        """
+        self._checkouts[customer_id] = self._checkouts.get(customer_id, 0) + 1
+        try:
+            await self.evict(customer_id)
+            yield
+        finally:
+            remaining = self._checkouts.pop(customer_id) - 1
+            if remaining:
+                self._checkouts[customer_id] = remaining
+            self.discard(customer_id)
+
+    def _ensure_writable(self, customer_id: ObjectId):
+        if customer_id in self._checkouts:
+            raise HTTPException(status_code=409, detail="Checkout in progress for this cart, please retry")
+
+    async def close(self):
+        """Flush every dirty cart; called from the application lifespan."""
+        await asyncio.gather(*self._flushes, return_exceptions=True)
+        for session in [*self._sessions.values(), *self._flushing.values()]:
+            await self._flush(session, "shutdown")
+        self._sessions.clear()
+        self._flushing.clear()
+
+    # ------------------------------
+    # Cart Operations
+    # ------------------------------
+    # Same semantics as the update pipelines in routes/cart_crud.py.
+
+    async def add_item(self, customer_id: ObjectId, item: Dict[str, Any]) -> bool:
+        """Add a line item or bump its quantity; returns True when the cart was created."""
+        session = await self.get(customer_id)
+        self._ensure_writable(customer_id)
+        now = datetime.utcnow().isoformat()
+        created = session.ensure_doc(now)
+        existing = session.find_item(item["product_id"])
+        if existing is not None:
+            existing["quantity"] += item["quantity"]
+        else:
+            session.doc["items"].append(dict(item))
+        session.touch(now)
+        self.changed(session)
+        return created
+
+    async def set_quantity(self, customer_id: ObjectId, product_id: str, quantity: int) -> Optional[str]:
+        """Returns an error ("cart" or "item") when there is nothing to update."""
+        session = await self.get(customer_id)
+        self._ensure_writable(customer_id)
+        if session.doc is None:
+            return "cart"
+        item = session.find_item(product_id)
+        if item is None:
+            return "item"
+        item["quantity"] = quantity
+        session.touch(datetime.utcnow().isoformat())
+        self.changed(session)
+        return None
+
+    async def remove_item(self, customer_id: ObjectId, product_id: str) -> bool:
+        """Returns False when the customer has no cart."""
+        session = await self.get(customer_id)
+        self._ensure_writable(customer_id)
+        if session.doc is None:
+            return False
+        session.doc["items"] = [item for item in session.doc["items"] if item["product_id"] != product_id]
+        session.touch(datetime.utcnow().isoformat())
+        self.changed(session)
+        return True
+
+    async def clear(self, customer_id: ObjectId):
+        session = await self.get(customer_id)
+        self._ensure_writable(customer_id)
+        if session.doc is not None:
+            session.doc = None
+            self.changed(session)
+
+
+cart_sessions = CartSessionStore()
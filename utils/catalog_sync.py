@@ -0,0 +1,243 @@
+import asyncio
+import bisect
+import os
+import time
+from datetime import datetime
+from typing import Any, Callable, Dict, List, Optional, Sequence, Tuple
+
+from pymongo.errors import OperationFailure, PyMongoError
+
+from config.db import categories_primary_collection, products_primary_collection, sync_state_collection
+from utils.cache import catalog_cache
+
+# Set CATALOG_SNAPSHOT=1 to serve catalog reads from an in-memory snapshot
+CATALOG_SNAPSHOT_ENABLED = os.getenv("CATALOG_SNAPSHOT", "0") == "1"
+# Seconds between polls when change streams are unavailable (no replica set)
+CATALOG_POLL_INTERVAL = float(os.getenv("CATALOG_POLL_INTERVAL", "5"))
+# Polls between full _id reconciliations, which is how polling notices deletes
+CATALOG_RECONCILE_EVERY = int(os.getenv("CATALOG_RECONCILE_EVERY", "12"))
+# Minimum seconds between catalog cache invalidations caused by change events; a burst
+# (bulk import, busy checkout) costs one immediate and one trailing invalidation per window
+CATALOG_INVALIDATE_INTERVAL = float(os.getenv("CATALOG_INVALIDATE_INTERVAL", "0.5"))
+
+# Server error codes meaning change streams cannot be used on this deployment
+CHANGE_STREAMS_UNSUPPORTED = {40573}
+# Server error codes meaning the resume token fell off the oplog
+CHANGE_STREAM_HISTORY_LOST = {136, 280, 286}
+
+# listener(operation, payload): "upsert" gets the document, "delete" its _id
+# and "reload" the full list of documents after a snapshot (re)load
+Listener = Callable[[str, Any], None]
+
+
+class CollectionSnapshot:
+    """In-memory copy of one collection, updated incrementally.
+
+    Sorted views are kept in step with bisect on every change rather than
+    re-sorted, and cache invalidations are rate limited, so bursts of change
+    events stay cheap.
+    """
+
+    def __init__(self, collection, namespace: str):
+        self.collection = collection
+        self.namespace = namespace
+        self.docs: Dict[Any, dict] = {}
+        self.ready = False
+        self.listeners: List[Listener] = []
+        self._sorted: Dict[Tuple[str, ...], Tuple[list, list]] = {}
+        self._invalidated_at = 0.0
+        self._invalidate_handle: Optional[asyncio.TimerHandle] = None
+
+    async def load(self):
+        docs = {}
+        async for doc in self.collection.find({}):
+            docs[doc["_id"]] = doc
+        self.docs = docs
+        self.ready = True
+        self._sorted.clear()
+        self._changed("reload", list(docs.values()))
+
+    def upsert(self, doc: dict):
+        previous = self.docs.get(doc["_id"])
+        self.docs[doc["_id"]] = doc
+        for fields, (docs, keys) in self._sorted.items():
+            if previous is not None:
+                self._unsort(docs, keys, previous, fields)
+            key = self.sort_key(doc, fields)
+            index = bisect.bisect_right(keys, key)
+            keys.insert(index, key)
+            docs.insert(index, doc)
+        self._changed("upsert", doc)
+
+    def remove(self, doc_id):
+        previous = self.docs.pop(doc_id, None)
+        if previous is not None:
+            for fields, (docs, keys) in self._sorted.items():
+                self._unsort(docs, keys, previous, fields)
+            self._changed("delete", doc_id)
+
+    def _unsort(self, docs: list, keys: list, doc: dict, fields: Tuple[str, ...]):
+        key = self.sort_key(doc, fields)
+        index = bisect.bisect_left(keys, key)
+        while index < len(keys) and keys[index] == key:
+            if docs[index]["_id"] == doc["_id"]:
+                del keys[index]
+                del docs[index]
+                return
+            index += 1
+
+    def _changed(self, operation: str, payload: Any):
+        self._invalidate_cache()
+        for listener in self.listeners:
+            listener(operation, payload)
+
+    def _invalidate_cache(self):
+        if self._invalidate_handle is not None:
+            return  # The pending trailing invalidation covers this change too
+        wait = self._invalidated_at + CATALOG_INVALIDATE_INTERVAL - time.monotonic()
+        if wait <= 0:
+            self._flush_invalidation()
+        else:
+            self._invalidate_handle = asyncio.get_running_loop().call_later(wait, self._flush_invalidation)
+
+    def _flush_invalidation(self):
+        self._invalidate_handle = None
+        self._invalidated_at = time.monotonic()
+        catalog_cache.invalidate(self.namespace)
+
+    def sorted_docs(self, fields: Sequence[str]) -> Tuple[list, list]:
+        """Documents ordered by `fields` (ascending) plus their sort keys, for bisecting."""
+        fields = tuple(fields)
+        if fields not in self._sorted:
+            docs = sorted(self.docs.values(), key=lambda d: self.sort_key(d, fields))
+            self._sorted[fields] = (docs, [self.sort_key(d, fields) for d in docs])
+        return self._sorted[fields]
+
+    @staticmethod
+    def sort_key(doc: dict, fields: Sequence[str]) -> tuple:
+        # Missing values sort first, like null does in MongoDB
+        return tuple((doc.get(f) is not None, doc.get(f) or "") if f != "_id" else doc["_id"] for f in fields)
+
+    def page(self, fields: Sequence[str], after: Optional[Sequence[Any]], predicate, limit: int) -> List[dict]:
+        """Return up to `limit` documents after the keyset position `after`."""
+        docs, keys = self.sorted_docs(fields)
+        start = 0
+        if after is not None:
+            start = bisect.bisect_right(keys, self.sort_key(dict(zip(fields, after)), fields))
+        page = []
+        for doc in docs[start:]:
+            if predicate(doc):
+                page.append(doc)
+                if len(page) >= limit:
+                    break
+        return page
+
+
+class CatalogSync:
+    """Keeps product and category snapshots current from change streams.
+
+    The stream is opened before the snapshot is loaded, so nothing committed
+    during the load is missed; events are applied by re-reading the current
+    document, which makes replaying them after the load harmless. The resume
+    token is persisted in `sync_state` after every event so a dropped stream
+    (or a restarted worker) continues where it stopped. Deployments without
+    a replica set fall back to polling `updated_at`.
+    """
+
+    def __init__(self):
+        # Events are applied by re-reading documents, which must not hit a lagging secondary
+        self.products = CollectionSnapshot(products_primary_collection, "products")
+        self.categories = CollectionSnapshot(categories_primary_collection, "categories")
+        self._tasks: List[asyncio.Task] = []
+
+    async def start(self):
+        for snapshot in (self.products, self.categories):
+            self._tasks.append(asyncio.create_task(self._run(snapshot)))
+
+    async def stop(self):
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks.clear()
+
+    async def _run(self, snapshot: CollectionSnapshot):
+        try:
+            await self._watch(snapshot)
+        except OperationFailure as e:
+            if e.code not in CHANGE_STREAMS_UNSUPPORTED:
+                raise
+            print(f"ℹ️ Change streams unavailable, polling {snapshot.namespace} for changes")
+            await self._poll(snapshot)
+
+    async def _watch(self, snapshot: CollectionSnapshot):
+        state_id = f"catalog:{snapshot.namespace}"
+        state = await sync_state_collection.find_one({"_id": state_id})
+        token = state["resume_token"] if state else None
+        delay = 1.0
+
+        while True:
+            try:
+                async with snapshot.collection.watch(resume_after=token) as stream:
+                    if not snapshot.ready:
+                        await snapshot.load()
+                    async for change in stream:
+                        await self._apply(snapshot, change)
+                        delay = 1.0  # Only a stream that delivers counts as recovered
+                        token = stream.resume_token
+                        await sync_state_collection.update_one(
+                            {"_id": state_id},
+                            {"$set": {"resume_token": token, "updated_at": datetime.utcnow()}},
+                            upsert=True,
+                        )
+            except OperationFailure as e:
+                if e.code in CHANGE_STREAMS_UNSUPPORTED:
+                    raise
+                # Start over from a fresh snapshot
+                token = None
+                snapshot.ready = False
+                if e.code not in CHANGE_STREAM_HISTORY_LOST:
+                    # e.g. missing privileges: back off rather than reloading the catalog in a loop
+                    print(f"⚠️ {snapshot.namespace} change stream failed, retrying in {delay:.0f}s: {e}")
+                    await asyncio.sleep(delay)
+                    delay = min(delay * 2, 30.0)
+            except PyMongoError as e:
+                print(f"⚠️ {snapshot.namespace} change stream interrupted: {e}")
+                await asyncio.sleep(delay)
+                delay = min(delay * 2, 30.0)
+
+    async def _apply(self, snapshot: CollectionSnapshot, change: dict):
+        operation = change["operationType"]
+        if operation in ("insert", "update", "replace"):
+            doc_id = change["documentKey"]["_id"]
+            doc = await snapshot.collection.find_one({"_id": doc_id})
+            if doc is None:
+                snapshot.remove(doc_id)
+            else:
+                snapshot.upsert(doc)
+        elif operation == "delete":
+            snapshot.remove(change["documentKey"]["_id"])
+        elif operation in ("drop", "rename", "invalidate"):
+            await snapshot.load()
+
+    async def _poll(self, snapshot: CollectionSnapshot):
+        if not snapshot.ready:
+            await snapshot.load()
+        last_seen = max((d.get("updated_at") or "" for d in snapshot.docs.values()), default="")
+        polls = 0
+
+        while True:
+            await asyncio.sleep(CATALOG_POLL_INTERVAL)
+            polls += 1
+            try:
+                async for doc in snapshot.collection.find({"updated_at": {"$gt": last_seen}}):
+                    snapshot.upsert(doc)
+                    last_seen = max(last_seen, doc["updated_at"])
+                if polls % CATALOG_RECONCILE_EVERY == 0:
+                    live_ids = {d["_id"] async for d in snapshot.collection.find({}, {"_id": 1})}
+                    for doc_id in set(snapshot.docs) - live_ids:
+                        snapshot.remove(doc_id)
+            except PyMongoError as e:
+                print(f"⚠️ Polling {snapshot.namespace} failed: {e}")
+
+
+catalog_sync = CatalogSync()
@@ -0,0 +1,106 @@
+import asyncio
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+from typing import Optional, Tuple
+
+from fastapi import HTTPException
+from passlib.context import CryptContext
+
+from utils.metrics import password_hash_duration
+
+# bcrypt cost factor; hashes with any other cost are upgraded on the next login
+BCRYPT_ROUNDS = int(os.getenv("BCRYPT_ROUNDS", "12"))
+# Worker processes doing the hashing (defaults to one per core)
+HASH_WORKERS = int(os.getenv("HASH_WORKERS", str(os.cpu_count() or 1)))
+# Hash/verify calls allowed to wait for a worker before new ones get a 503
+HASH_MAX_PENDING = int(os.getenv("HASH_MAX_PENDING", str(HASH_WORKERS * 4)))
+
+# ✅ Password hashing (pinning min/max rounds makes needs_update() flag old costs)
+pwd_context = CryptContext(
+    schemes=["bcrypt"],
+    deprecated="auto",
+    bcrypt__default_rounds=BCRYPT_ROUNDS,
+    bcrypt__min_rounds=BCRYPT_ROUNDS,
+    bcrypt__max_rounds=BCRYPT_ROUNDS,
+)
+
+_pool: Optional[ProcessPoolExecutor] = None
+
+# Counters for the metrics endpoint; only touched from the event loop thread
+stats = {
+    "pending": 0,  # queued or running in the pool right now
+    "completed": 0,
+    "failed": 0,  # raised in the worker, or the pool broke
+    "rejected": 0,
+    "rehashed": 0,
+    "seconds_total": 0.0,
+    "seconds_max": 0.0,
+}
+
+
+# These run inside the worker processes
+def _hash(password: str) -> str:
+    return pwd_context.hash(password)
+
+
+def _verify_and_update(password: str, hashed: str) -> Tuple[bool, Optional[str]]:
+    return pwd_context.verify_and_update(password, hashed)
+
+
+def _get_pool() -> ProcessPoolExecutor:
+    global _pool
+    if _pool is None:
+        _pool = ProcessPoolExecutor(max_workers=HASH_WORKERS)
+    return _pool
+
+
+async def _submit(func, *args):
+    if stats["pending"] >= HASH_MAX_PENDING:
+        stats["rejected"] += 1
+        raise HTTPException(
+            status_code=503,
+            detail="Authentication is busy, please retry",
+            headers={"Retry-After": "1"},
+        )
+
+    stats["pending"] += 1
+    started = time.perf_counter()
+    try:
+        result = await asyncio.get_running_loop().run_in_executor(_get_pool(), func, *args)
+    except Exception:
+        stats["failed"] += 1
+        raise
+    finally:
+        elapsed = time.perf_counter() - started
+        password_hash_duration.observe(elapsed, func.__name__.lstrip("_"))
+        stats["pending"] -= 1
+        stats["seconds_total"] += elapsed
+        stats["seconds_max"] = max(stats["seconds_max"], elapsed)
+    stats["completed"] += 1
+    return result
+
+
+async def hash_password(password: str) -> str:
+    """Hash a password in the worker pool."""
+    return await _submit(_hash, password)
+
+
+async def verify_password(password: str, hashed: str) -> Tuple[bool, Optional[str]]:
+    """Check a password in the worker pool.
+
+    Returns (valid, new_hash); new_hash is set when the stored hash uses an
+    outdated scheme or cost factor and should replace the stored one.
+    """
+    valid, new_hash = await _submit(_verify_and_update, password, hashed)
+    if new_hash:
+        stats["rehashed"] += 1
+    return valid, new_hash
+
+
+def shutdown_hashing():
+    """Stop the worker processes; called from the application lifespan."""
+    global _pool
+    if _pool is not None:
+        _pool.shutdown(wait=False, cancel_futures=True)
+        _pool = None
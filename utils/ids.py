@@ -0,0 +1,54 @@
+import asyncio
+import os
+from typing import Optional
+
+from pymongo import ReturnDocument
+
+from config.db import counters_collection
+
+# Order IDs reserved per counter round trip; unused IDs are lost on restart
+ORDER_ID_BLOCK_SIZE = int(os.getenv("ORDER_ID_BLOCK_SIZE", "50"))
+
+
+class BlockAllocator:
+    """Hi/lo sequence allocator backed by a document in `counters_collection`.
+
+    Each process atomically reserves `block_size` numbers with one `$inc` and
+    hands them out from memory, so numbers stay unique across workers while
+    most allocations cost no round trip. Numbers are increasing per process
+    but may interleave across processes and leave gaps.
+    """
+
+    def __init__(self, counter_id: str, block_size: int):
+        if block_size < 1:
+            raise ValueError("block_size must be at least 1")
+        self.counter_id = counter_id
+        self.block_size = block_size
+        self._next = 1
+        self._high = 0  # Last number of the reserved block
+        self._lock: Optional[asyncio.Lock] = None
+
+    async def _reserve_block(self):
+        counter = await counters_collection.find_one_and_update(
+            {"_id": self.counter_id},
+            {"$inc": {"seq": self.block_size}},
+            upsert=True,
+            return_document=ReturnDocument.AFTER,
+        )
+        self._high = counter["seq"]
+        self._next = self._high - self.block_size + 1
+
+    async def next(self) -> int:
+        """Return the next number, reserving a new block when this one is used up."""
+        if self._lock is None:
+            self._lock = asyncio.Lock()
+        while self._next > self._high:
+            async with self._lock:
+                if self._next > self._high:
+                    await self._reserve_block()
+        value = self._next
+        self._next += 1
+        return value
+
+
+order_id_allocator = BlockAllocator("order_id", ORDER_ID_BLOCK_SIZE)
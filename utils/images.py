@@ -0,0 +1,133 @@
+import asyncio
+import io
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+from typing import Any, BinaryIO, Dict, List, Optional, Sequence, Union
+
+from PIL import Image, ImageOps, UnidentifiedImageError
+
+from utils.metrics import image_processing_duration
+
+# Longest edge in pixels of each stored rendition; images are never upscaled
+IMAGE_VARIANTS = {
+    "thumbnail": int(os.getenv("IMAGE_THUMBNAIL_SIZE", "200")),
+    "card": int(os.getenv("IMAGE_CARD_SIZE", "600")),
+    "full": int(os.getenv("IMAGE_FULL_SIZE", "1600")),
+}
+# Every variant is encoded once per format: WebP for browsers that take it, JPEG as fallback
+IMAGE_FORMATS = ("webp", "jpeg")
+WEBP_QUALITY = int(os.getenv("IMAGE_WEBP_QUALITY", "80"))
+JPEG_QUALITY = int(os.getenv("IMAGE_JPEG_QUALITY", "82"))
+# Worker processes doing the decoding and resizing (defaults to one per core)
+IMAGE_WORKERS = int(os.getenv("IMAGE_WORKERS", str(os.cpu_count() or 1)))
+
+# Refuse decompression bombs (Pillow raises above twice this many pixels)
+Image.MAX_IMAGE_PIXELS = int(os.getenv("IMAGE_MAX_PIXELS", str(40_000_000)))
+
+_pool: Optional[ProcessPoolExecutor] = None
+
+
+class ImageError(Exception):
+    """Raised when an upload is not an image Pillow can decode."""
+
+
+# These run inside the worker processes
+def _encode(image: Image.Image, fmt: str, icc_profile: Optional[bytes]) -> bytes:
+    buffer = io.BytesIO()
+    if fmt == "webp":
+        image.save(buffer, "WEBP", quality=WEBP_QUALITY, method=4, icc_profile=icc_profile)
+    else:
+        if image.mode != "RGB":
+            # JPEG has no alpha channel: flatten onto white
+            background = Image.new("RGB", image.size, (255, 255, 255))
+            background.paste(image, mask=image.getchannel("A"))
+            image = background
+        image.save(buffer, "JPEG", quality=JPEG_QUALITY, optimize=True, progressive=True, icc_profile=icc_profile)
+    return buffer.getvalue()
+
+
+def _render_variants(data: bytes) -> Dict[str, Any]:
+    """Decode one upload and return every variant as encoded bytes.
+
+    EXIF orientation is applied to the pixels and no EXIF/XMP is written back,
+    so GPS and camera metadata never leave the server. The ICC profile is kept.
+    """
+    try:
+        with Image.open(io.BytesIO(data)) as source:
+            largest = max(IMAGE_VARIANTS.values())
+            source.draft("RGB", (largest, largest))  # JPEG: let libjpeg decode at a reduced scale
+            icc_profile = source.info.get("icc_profile")
+            image = ImageOps.exif_transpose(source)
+            has_alpha = image.mode in ("RGBA", "LA") or "transparency" in image.info
+            image = image.convert("RGBA" if has_alpha else "RGB")
+    except UnidentifiedImageError:
+        raise ImageError("not a supported image format") from None
+    except (OSError, ValueError, Image.DecompressionBombError) as e:
+        raise ImageError(str(e)) from None
+
+    original_size = image.size
+    variants = {}
+    # Largest first, so each smaller variant is resampled from the previous one
+    for name, edge in sorted(IMAGE_VARIANTS.items(), key=lambda item: -item[1]):
+        image.thumbnail((edge, edge), Image.LANCZOS)
+        variants[name] = {
+            "width": image.width,
+            "height": image.height,
+            **{fmt: _encode(image, fmt, icc_profile) for fmt in IMAGE_FORMATS},
+        }
+    return {"width": original_size[0], "height": original_size[1], "variants": variants}
+
+
+def probe_image(data: bytes) -> str:
+    """Cheap validity check: parses only the header and returns the format name."""
+    try:
+        with Image.open(io.BytesIO(data)) as image:
+            return image.format
+    except UnidentifiedImageError:
+        raise ImageError("not a supported image format") from None
+    except (OSError, ValueError, Image.DecompressionBombError) as e:
+        raise ImageError(str(e)) from None
+
+
+def _get_pool() -> ProcessPoolExecutor:
+    global _pool
+    if _pool is None:
+        _pool = ProcessPoolExecutor(max_workers=IMAGE_WORKERS)
+    return _pool
+
+
+async def render_variants(data: bytes) -> Dict[str, Any]:
+    """Resize and re-encode one image in the worker pool."""
+    started = time.perf_counter()
+    outcome = "error"
+    try:
+        result = await asyncio.get_running_loop().run_in_executor(_get_pool(), _render_variants, data)
+        outcome = "ok"
+        return result
+    except ImageError:
+        outcome = "invalid"
+        raise
+    finally:
+        image_processing_duration.observe(time.perf_counter() - started, outcome)
+
+
+async def read_uploads(files: Sequence[Union[BinaryIO, bytes]]) -> List[bytes]:
+    """Read file objects off the event loop; bytes are passed through."""
+    return await asyncio.gather(
+        *(asyncio.to_thread(file.read) if hasattr(file, "read") else asyncio.sleep(0, file) for file in files)
+    )
+
+
+async def render_uploads(files: Sequence[Union[BinaryIO, bytes]]) -> List[Dict[str, Any]]:
+    """Read and process several uploads concurrently, preserving their order."""
+    datas = await read_uploads(files)
+    return await asyncio.gather(*(render_variants(data) for data in datas))
+
+
+def shutdown_images():
+    """Stop the worker processes; called from the application lifespan."""
+    global _pool
+    if _pool is not None:
+        _pool.shutdown(wait=False, cancel_futures=True)
+        _pool = None
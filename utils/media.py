@@ -0,0 +1,142 @@
+import asyncio
+import os
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
+from typing import Any, BinaryIO, Dict, List, Optional, Sequence, Union
+
+import cloudinary.uploader
+
+from utils.images import IMAGE_FORMATS, render_uploads
+from utils.metrics import cloudinary_upload_duration
+
+# Threads that run the blocking Cloudinary SDK calls
+UPLOAD_WORKERS = int(os.getenv("CLOUDINARY_UPLOAD_WORKERS", "8"))
+# Uploads in flight across the whole process, shared by every request
+UPLOAD_CONCURRENCY = int(os.getenv("CLOUDINARY_UPLOAD_CONCURRENCY", str(UPLOAD_WORKERS)))
+# Seconds to wait for a single upload before giving up on it
+UPLOAD_TIMEOUT = float(os.getenv("CLOUDINARY_UPLOAD_TIMEOUT", "30"))
+
+_executor = ThreadPoolExecutor(max_workers=UPLOAD_WORKERS, thread_name_prefix="cloudinary")
+_semaphore = asyncio.Semaphore(UPLOAD_CONCURRENCY)
+_cleanup_tasks = set()
+
+
+class UploadError(Exception):
+    """Raised when at least one upload in a batch failed or timed out."""
+
+
+def _run_in_executor(func, *args, **kwargs) -> asyncio.Future:
+    return asyncio.get_running_loop().run_in_executor(_executor, partial(func, *args, **kwargs))
+
+
+async def _destroy_when_done(upload: asyncio.Future, public_id: str):
+    """Delete an asset once its (possibly still running) upload has finished."""
+    try:
+        await upload
+    except Exception:
+        return  # Nothing reached Cloudinary
+    try:
+        await _run_in_executor(cloudinary.uploader.destroy, public_id)
+    except Exception as e:
+        print(f"⚠️ Could not delete orphaned upload {public_id}: {e}")
+
+
+def _schedule_cleanup(upload: asyncio.Future, public_id: str):
+    task = asyncio.create_task(_destroy_when_done(upload, public_id))
+    _cleanup_tasks.add(task)
+    task.add_done_callback(_cleanup_tasks.discard)
+
+
+async def upload_files(
+    files: Sequence[Union[BinaryIO, bytes]],
+    folder: str,
+    public_ids: Optional[Sequence[str]] = None,
+    cleanup: bool = True,
+) -> List[str]:
+    """Upload files to Cloudinary concurrently and return their secure URLs in order.
+
+    If any upload fails or times out, UploadError is raised and (with
+    `cleanup`) the ones that did succeed are deleted again in the background.
+    Callers that retry with the same public_ids pass cleanup=False, since a
+    retry overwrites whatever the failed attempt left behind.
+    """
+    if public_ids is None:
+        public_ids = [f"{folder}/{uuid.uuid4().hex}" for _ in files]
+    uploads = []
+
+    async def upload(file, public_id):
+        async with _semaphore:
+            started = time.perf_counter()
+            future = _run_in_executor(cloudinary.uploader.upload, file, public_id=public_id)
+            uploads.append((future, public_id))
+            outcome = "error"
+            try:
+                result = await asyncio.wait_for(asyncio.shield(future), UPLOAD_TIMEOUT)
+                outcome = "ok"
+                return result
+            except asyncio.TimeoutError:
+                outcome = "timeout"
+                raise
+            finally:
+                cloudinary_upload_duration.observe(time.perf_counter() - started, outcome)
+
+    results = await asyncio.gather(
+        *(upload(file, public_id) for file, public_id in zip(files, public_ids)),
+        return_exceptions=True,
+    )
+
+    errors = [r for r in results if isinstance(r, BaseException)]
+    if errors:
+        if cleanup:
+            for future, public_id in uploads:
+                _schedule_cleanup(future, public_id)
+        error = errors[0]
+        if isinstance(error, asyncio.TimeoutError):
+            raise UploadError(f"upload timed out after {UPLOAD_TIMEOUT:g}s")
+        raise UploadError(str(error))
+
+    return [result["secure_url"] for result in results]
+
+
+async def upload_images(
+    files: Sequence[Union[BinaryIO, bytes]],
+    folder: str,
+    base_ids: Optional[Sequence[str]] = None,
+    cleanup: bool = True,
+) -> List[Dict[str, Any]]:
+    """Resize uploads into their variants and upload all of them concurrently.
+
+    Returns one variant map per file, in order, shaped like
+    {"thumbnail": {"width": .., "height": .., "webp": url, "jpeg": url}, "card": .., "full": ..}.
+    Raises ImageError for files that are not images and UploadError as upload_files does.
+    Passing fixed `base_ids` makes the upload idempotent: repeating it
+    overwrites the same assets instead of creating new ones.
+    """
+    rendered = await render_uploads(files)
+    if base_ids is None:
+        base_ids = [f"{folder}/{uuid.uuid4().hex}" for _ in rendered]
+
+    payloads, public_ids, slots = [], [], []
+    for index, (image, base_id) in enumerate(zip(rendered, base_ids)):
+        for name, variant in image["variants"].items():
+            for fmt in IMAGE_FORMATS:
+                payloads.append(variant[fmt])
+                public_ids.append(f"{base_id}/{name}-{fmt}")
+                slots.append((index, name, fmt))
+
+    urls = await upload_files(payloads, folder, public_ids, cleanup=cleanup)
+
+    variant_maps = [
+        {name: {"width": v["width"], "height": v["height"]} for name, v in image["variants"].items()}
+        for image in rendered
+    ]
+    for (index, name, fmt), url in zip(slots, urls):
+        variant_maps[index][name][fmt] = url
+    return variant_maps
+
+
+def shutdown_uploads():
+    """Stop accepting uploads; called from the application lifespan."""
+    _executor.shutdown(wait=False)
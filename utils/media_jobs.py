@@ -0,0 +1,225 @@
+import asyncio
+import os
+import random
+from datetime import datetime, timedelta
+from typing import Any, BinaryIO, Dict, List, Optional, Sequence
+
+from bson import ObjectId
+from motor.motor_asyncio import AsyncIOMotorGridFSBucket
+from pymongo import ReturnDocument
+from pymongo.errors import PyMongoError
+
+from config.db import categories_primary_collection, get_database, media_jobs_collection, products_primary_collection
+from utils.cache import catalog_cache
+from utils.images import ImageError, probe_image, read_uploads
+from utils.media import upload_images
+from utils.metrics import media_jobs_processed
+from utils.search import search_index
+
+# Set MEDIA_QUEUE=1 to upload images in the background. Create responses then carry
+# images_status/media_job_id/status_url instead of the image URLs, so clients must poll.
+MEDIA_QUEUE_ENABLED = os.getenv("MEDIA_QUEUE", "0") == "1"
+# Jobs processed concurrently by this worker process
+MEDIA_WORKERS = int(os.getenv("MEDIA_WORKERS", "2"))
+# Attempts before a job is marked failed; bad images fail on the first one
+MEDIA_MAX_ATTEMPTS = int(os.getenv("MEDIA_MAX_ATTEMPTS", "5"))
+# Retry delay is base * 2^(attempt-1) seconds, capped, with jitter
+MEDIA_RETRY_BASE = float(os.getenv("MEDIA_RETRY_BASE", "5"))
+MEDIA_RETRY_MAX = float(os.getenv("MEDIA_RETRY_MAX", "600"))
+# A running job whose worker died is picked up again after this many seconds
+MEDIA_LEASE_SECONDS = float(os.getenv("MEDIA_LEASE_SECONDS", "300"))
+# Seconds between queue polls; jobs enqueued by this process wake workers at once
+MEDIA_POLL_INTERVAL = float(os.getenv("MEDIA_POLL_INTERVAL", "5"))
+
+# GridFS bucket holding the original uploads until their job completes
+UPLOADS_BUCKET = "media_uploads"
+
+TARGETS = {"products": products_primary_collection, "categories": categories_primary_collection}
+
+
+def _bucket() -> AsyncIOMotorGridFSBucket:
+    return AsyncIOMotorGridFSBucket(get_database(), bucket_name=UPLOADS_BUCKET)
+
+
+def _target_update(target: str, variant_maps: List[Dict[str, Any]]) -> Dict[str, Any]:
+    """Fields written onto the product/category once its images are uploaded."""
+    if target == "categories":
+        variants = variant_maps[0]
+        return {"image": variants["full"]["jpeg"], "image_variants": variants}
+    return {"images": [v["full"]["jpeg"] for v in variant_maps], "image_variants": variant_maps}
+
+
+async def read_images(files: Sequence[BinaryIO]) -> List[bytes]:
+    """Read uploads and check their headers, raising ImageError for non-images."""
+    datas = await read_uploads(files)
+    for data in datas:
+        await asyncio.to_thread(probe_image, data)
+    return datas
+
+
+class MediaQueue:
+    """Durable queue of image uploads, stored in `media_jobs` and run by asyncio workers.
+
+    Jobs are claimed with find_one_and_update, so any number of workers in any
+    number of processes can share the queue. A claim leases the job by pushing
+    `run_at` into the future; if the worker dies, the job becomes claimable again
+    once the lease runs out. Cloudinary public_ids derive from the job id, so a
+    repeated attempt overwrites the same assets rather than creating new ones,
+    and results are only applied while the target still points at this job.
+    """
+
+    def __init__(self):
+        self._tasks: List[asyncio.Task] = []
+        self._wakeup = asyncio.Event()
+
+    async def start(self):
+        for _ in range(MEDIA_WORKERS):
+            self._tasks.append(asyncio.create_task(self._worker()))
+
+    async def stop(self):
+        # Interrupted jobs keep their lease and are retried once it expires
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks.clear()
+
+    async def enqueue(self, job_id: ObjectId, target: str, target_id: ObjectId, folder: str, datas: Sequence[bytes]):
+        """Store the uploads and queue a job that attaches their variants to the target.
+
+        The target document must already carry `media_job_id: job_id`.
+        """
+        bucket = _bucket()
+        file_ids = await asyncio.gather(*(
+            bucket.upload_from_stream(f"{job_id}-{index}", data, metadata={"job_id": job_id})
+            for index, data in enumerate(datas)
+        ))
+        now = datetime.utcnow()
+        await media_jobs_collection.insert_one({
+            "_id": job_id,
+            "target": target,
+            "target_id": target_id,
+            "folder": folder,
+            "files": file_ids,
+            "status": "queued",
+            "attempts": 0,
+            "run_at": now,
+            "last_error": None,
+            "created_at": now,
+            "updated_at": now,
+        })
+        self._wakeup.set()
+
+    async def retry(self, job_id: ObjectId) -> bool:
+        """Queue a failed job again from its first attempt."""
+        job = await media_jobs_collection.find_one_and_update(
+            {"_id": job_id, "status": "failed"},
+            {"$set": {"status": "queued", "attempts": 0, "run_at": datetime.utcnow(), "updated_at": datetime.utcnow()}},
+        )
+        if job is None:
+            return False
+        await TARGETS[job["target"]].update_one(
+            {"_id": job["target_id"], "media_job_id": job_id}, {"$set": {"images_status": "pending"}}
+        )
+        self._wakeup.set()
+        return True
+
+    async def _worker(self):
+        while True:
+            self._wakeup.clear()
+            try:
+                job = await self._claim()
+            except PyMongoError as e:
+                print(f"⚠️ Media queue poll failed: {e}")
+                job = None
+            if job is None:
+                try:
+                    await asyncio.wait_for(self._wakeup.wait(), MEDIA_POLL_INTERVAL)
+                except asyncio.TimeoutError:
+                    pass
+                continue
+            try:
+                await self._process(job)
+            except Exception as e:
+                # Could not record the outcome; the lease expiring will retry the job
+                print(f"⚠️ Media job {job['_id']} failed unrecorded: {e}")
+
+    async def _claim(self) -> Optional[dict]:
+        now = datetime.utcnow()
+        return await media_jobs_collection.find_one_and_update(
+            {"status": {"$in": ["queued", "running"]}, "run_at": {"$lte": now}},
+            {
+                "$set": {"status": "running", "run_at": now + timedelta(seconds=MEDIA_LEASE_SECONDS), "updated_at": now},
+                "$inc": {"attempts": 1},
+            },
+            sort=[("run_at", 1)],
+            return_document=ReturnDocument.AFTER,
+        )
+
+    async def _process(self, job: dict):
+        try:
+            bucket = _bucket()
+            datas = []
+            for file_id in job["files"]:
+                stream = await bucket.open_download_stream(file_id)
+                datas.append(await stream.read())
+            base_ids = [f"{job['folder']}/{job['_id']}-{index}" for index in range(len(datas))]
+            variant_maps = await upload_images(datas, job["folder"], base_ids, cleanup=False)
+            await self._apply(job, variant_maps)
+        except ImageError as e:
+            await self._fail(job, f"Invalid image: {e}")
+        except Exception as e:
+            if job["attempts"] >= MEDIA_MAX_ATTEMPTS:
+                await self._fail(job, str(e))
+            else:
+                await self._schedule_retry(job, str(e))
+        else:
+            await self._complete(job)
+
+    async def _apply(self, job: dict, variant_maps: List[Dict[str, Any]]):
+        fields = _target_update(job["target"], variant_maps)
+        updated = await TARGETS[job["target"]].find_one_and_update(
+            {"_id": job["target_id"], "media_job_id": job["_id"]},
+            {"$set": {**fields, "images_status": "ready", "updated_at": datetime.utcnow().isoformat()}},
+            return_document=ReturnDocument.AFTER,
+        )
+        catalog_cache.invalidate(job["target"])
+        if updated is not None and job["target"] == "products":
+            search_index.add(updated)
+
+    async def _finish(self, job: dict, fields: Dict[str, Any]) -> bool:
+        # Matching on attempts keeps a worker whose lease was taken over from clobbering the newer attempt
+        result = await media_jobs_collection.update_one(
+            {"_id": job["_id"], "attempts": job["attempts"]},
+            {"$set": {**fields, "updated_at": datetime.utcnow()}},
+        )
+        return result.modified_count == 1
+
+    async def _complete(self, job: dict):
+        media_jobs_processed.inc(job["target"], "completed")
+        if await self._finish(job, {"status": "completed", "last_error": None, "finished_at": datetime.utcnow()}):
+            bucket = _bucket()
+            for file_id in job["files"]:
+                try:
+                    await bucket.delete(file_id)
+                except PyMongoError as e:
+                    print(f"⚠️ Could not delete media upload {file_id}: {e}")
+
+    async def _schedule_retry(self, job: dict, error: str):
+        media_jobs_processed.inc(job["target"], "retried")
+        delay = min(MEDIA_RETRY_BASE * 2 ** (job["attempts"] - 1), MEDIA_RETRY_MAX)
+        delay *= random.uniform(0.8, 1.2)  # Spread out retries of jobs that failed together
+        run_at = datetime.utcnow() + timedelta(seconds=delay)
+        await self._finish(job, {"status": "queued", "run_at": run_at, "last_error": error})
+
+    async def _fail(self, job: dict, error: str):
+        # The original uploads are kept so the job can be retried through the API
+        media_jobs_processed.inc(job["target"], "failed")
+        if await self._finish(job, {"status": "failed", "last_error": error, "finished_at": datetime.utcnow()}):
+            await TARGETS[job["target"]].update_one(
+                {"_id": job["target_id"], "media_job_id": job["_id"]},
+                {"$set": {"images_status": "failed", "updated_at": datetime.utcnow().isoformat()}},
+            )
+            catalog_cache.invalidate(job["target"])
+
+
+media_queue = MediaQueue()
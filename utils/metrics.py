@@ -0,0 +1,293 @@
+import bisect
+from typing import Callable, Dict, Iterable, List, Optional, Tuple
+
+from pymongo import monitoring
+
+# Upper bounds (seconds) shared by every latency histogram
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+# ------------------------------
+# Metric Types
+# ------------------------------
+# Updates take no locks. Almost all of them happen on the event loop thread;
+# the few made from driver or executor threads rely on the GIL and at worst
+# drop an increment, which is acceptable for monitoring data.
+
+
+def _escape(value) -> str:
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _format_labels(names: Tuple[str, ...], values: Tuple[str, ...], extra: str = "") -> str:
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+class Histogram:
+    __slots__ = ("buckets", "counts", "sum", "count")
+
+    def __init__(self, buckets: Tuple[float, ...]):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)  # Last slot is +Inf
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value: float):
+        self.counts[bisect.bisect_left(self.buckets, value)] += 1
+        self.sum += value
+        self.count += 1
+
+
+class Metric:
+    """A named family of time series, one child per label combination."""
+
+    kind = ""
+
+    def __init__(self, name: str, help_text: str, labels: Iterable[str] = (),
+                 collect: Optional[Callable[[], Dict[tuple, float]]] = None):
+        self.name = name
+        self.help = help_text
+        self.label_names = tuple(labels)
+        self.children: Dict[Tuple[str, ...], object] = {}
+        self.collect = collect  # Computes values at scrape time instead of on updates
+        REGISTRY.append(self)
+
+    def _new_child(self):
+        raise NotImplementedError
+
+    def labels(self, *values: str):
+        child = self.children.get(values)
+        if child is None:
+            child = self.children.setdefault(values, self._new_child())
+        return child
+
+    def render(self) -> List[str]:
+        if self.collect:
+            for values, value in self.collect().items():
+                self.labels(*values)[0] = value
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} {self.kind}"]
+        for values, child in list(self.children.items()):
+            lines.append(f"{self.name}{_format_labels(self.label_names, values)} {child[0]}")
+        return lines
+
+
+class Counter(Metric):
+    kind = "counter"
+
+    def _new_child(self):
+        return [0]
+
+    def inc(self, *values: str, amount: float = 1):
+        self.labels(*values)[0] += amount
+
+
+class Gauge(Metric):
+    kind = "gauge"
+
+    def _new_child(self):
+        return [0]
+
+    def add(self, *values: str, amount: float = 1):
+        self.labels(*values)[0] += amount
+
+
+class HistogramMetric(Metric):
+    kind = "histogram"
+
+    def __init__(self, name, help_text, labels=(), buckets: Tuple[float, ...] = LATENCY_BUCKETS):
+        self.buckets = buckets
+        super().__init__(name, help_text, labels)
+
+    def _new_child(self):
+        return Histogram(self.buckets)
+
+    def observe(self, value: float, *values: str):
+        self.labels(*values).observe(value)
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} {self.kind}"]
+        for values, child in list(self.children.items()):
+            cumulative = 0
+            for bound, count in zip((*self.buckets, "+Inf"), child.counts):
+                cumulative += count
+                le = f'le="{bound}"'
+                lines.append(f"{self.name}_bucket{_format_labels(self.label_names, values, le)} {cumulative}")
+            labels = _format_labels(self.label_names, values)
+            lines.append(f"{self.name}_sum{labels} {child.sum}")
+            lines.append(f"{self.name}_count{labels} {child.count}")
+        return lines
+
+
+REGISTRY: List[Metric] = []
+
+
+def route_template(scope) -> str:
+    """Low-cardinality route label such as "/products/products/{product_id}"."""
+    route = scope.get("route")
+    if route is None:
+        return "unmatched"
+    path = scope["path"]
+    # Older FastAPI copies routes with the router prefix included
+    if route.path_regex.match(path):
+        return route.path
+    # Newer FastAPI matches inside the included router: rebuild from the path
+    segments = path.split("/")
+    for name, value in scope.get("path_params", {}).items():
+        value = str(value)
+        for i in range(len(segments) - 1, -1, -1):
+            if segments[i] == value:
+                segments[i] = "{" + name + "}"
+                break
+    return "/".join(segments)
+
+
+def render_metrics() -> str:
+    """All registered metrics in the Prometheus text exposition format."""
+    lines = []
+    for metric in REGISTRY:
+        lines.extend(metric.render())
+    return "\n".join(lines) + "\n"
+
+
+# ------------------------------
+# Metrics
+# ------------------------------
+
+http_request_duration = HistogramMetric(
+    "http_request_duration_seconds", "Time to produce response headers", ("method", "route", "status")
+)
+http_requests_in_flight = Gauge(
+    "http_requests_in_flight", "Requests currently being handled", ("method",)
+)
+mongo_command_duration = HistogramMetric(
+    "mongodb_command_duration_seconds", "Server round-trip time of MongoDB commands", ("collection", "command")
+)
+mongo_command_failures = Counter(
+    "mongodb_command_failures_total", "MongoDB commands that returned an error", ("collection", "command")
+)
+mongo_documents_returned = Counter(
+    "mongodb_documents_returned_total", "Documents returned in cursor batches", ("collection", "command")
+)
+cloudinary_upload_duration = HistogramMetric(
+    "cloudinary_upload_duration_seconds", "Duration of single Cloudinary uploads", ("outcome",)
+)
+password_hash_duration = HistogramMetric(
+    "password_hash_duration_seconds", "Queueing plus hashing time of bcrypt operations", ("operation",)
+)
+image_processing_duration = HistogramMetric(
+    "image_processing_duration_seconds", "Queueing plus decode/resize/encode time per uploaded image", ("outcome",)
+)
+media_jobs_processed = Counter(
+    "media_jobs_processed_total", "Background media job attempts by outcome", ("target", "outcome")
+)
+cart_session_mutations = Counter(
+    "cart_session_mutations_total", "Cart changes applied to in-memory cart sessions"
+)
+cart_session_writes = Counter(
+    "cart_session_writes_total", "Cart documents written back to MongoDB by cart sessions", ("reason",)
+)
+cached_responses = Counter(
+    "cached_responses_total", "Cached catalog bodies sent, by content encoding", ("encoding",)
+)
+admission_rejections = Counter(
+    "admission_rejections_total", "Requests refused by admission control", ("prefix", "reason")
+)
+mongo_pool_connections = Gauge(
+    "mongodb_pool_connections", "Connections per server pool by state", ("address", "state")
+)
+mongo_pool_checkout_wait = HistogramMetric(
+    "mongodb_pool_checkout_wait_seconds", "Time spent waiting for a pooled connection", ("outcome",)
+)
+
+
+# ------------------------------
+# MongoDB Command Listener
+# ------------------------------
+
+class CommandTimer(monitoring.CommandListener):
+    """Records per-collection command durations and returned document counts."""
+
+    def __init__(self):
+        self._collections: Dict[Tuple[object, int], str] = {}
+
+    def started(self, event):
+        target = event.command.get(event.command_name)
+        if event.command_name == "getMore":
+            target = event.command.get("collection")
+        self._collections[(event.connection_id, event.request_id)] = target if isinstance(target, str) else "-"
+
+    def succeeded(self, event):
+        collection = self._collections.pop((event.connection_id, event.request_id), "-")
+        mongo_command_duration.observe(event.duration_micros / 1e6, collection, event.command_name)
+        cursor = event.reply.get("cursor") if isinstance(event.reply, dict) else None
+        if cursor:
+            batch = cursor.get("firstBatch", cursor.get("nextBatch"))
+            if batch:
+                mongo_documents_returned.inc(collection, event.command_name, amount=len(batch))
+
+    def failed(self, event):
+        collection = self._collections.pop((event.connection_id, event.request_id), "-")
+        mongo_command_duration.observe(event.duration_micros / 1e6, collection, event.command_name)
+        mongo_command_failures.inc(collection, event.command_name)
+
+
+mongo_command_listener = CommandTimer()
+
+
+# ------------------------------
+# MongoDB Connection Pool Listener
+# ------------------------------
+
+class PoolMonitor(monitoring.ConnectionPoolListener):
+    """Tracks open / checked-out connections and checkout wait per server."""
+
+    def snapshot(self) -> Dict[str, Dict[str, float]]:
+        pools: Dict[str, Dict[str, float]] = {}
+        for (address, state), child in list(mongo_pool_connections.children.items()):
+            pools.setdefault(address, {})[state] = child[0]
+        return pools
+
+    @staticmethod
+    def _address(event) -> str:
+        host, port = event.address
+        return f"{host}:{port}"
+
+    def pool_created(self, event):
+        mongo_pool_connections.labels(self._address(event), "open")
+        mongo_pool_connections.labels(self._address(event), "checked_out")
+
+    def pool_ready(self, event):
+        pass
+
+    def pool_cleared(self, event):
+        pass
+
+    def pool_closed(self, event):
+        pass
+
+    def connection_created(self, event):
+        mongo_pool_connections.add(self._address(event), "open")
+
+    def connection_ready(self, event):
+        pass
+
+    def connection_closed(self, event):
+        mongo_pool_connections.add(self._address(event), "open", amount=-1)
+
+    def connection_check_out_started(self, event):
+        pass
+
+    def connection_check_out_failed(self, event):
+        mongo_pool_checkout_wait.observe(getattr(event, "duration", 0) or 0, "failed")
+
+    def connection_checked_out(self, event):
+        mongo_pool_connections.add(self._address(event), "checked_out")
+        mongo_pool_checkout_wait.observe(getattr(event, "duration", 0) or 0, "ok")
+
+    def connection_checked_in(self, event):
+        mongo_pool_connections.add(self._address(event), "checked_out", amount=-1)
+
+
+mongo_pool_listener = PoolMonitor()
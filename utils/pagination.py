@@ -0,0 +1,85 @@
+import base64
+import binascii
+import json
+from datetime import datetime
+from typing import Any, Dict, List, Sequence, Tuple
+
+from bson import ObjectId
+from fastapi import HTTPException
+
+# A sort specification is an ordered list of (field, direction) pairs, e.g.
+# [("created_at", -1), ("_id", -1)]. The last field must be unique (`_id`).
+SortSpec = Sequence[Tuple[str, int]]
+
+
+def _dump_value(value: Any) -> Any:
+    """Tag BSON types that JSON cannot carry so they survive the round trip."""
+    if isinstance(value, ObjectId):
+        return {"$oid": str(value)}
+    if isinstance(value, datetime):
+        return {"$date": value.isoformat()}
+    return value
+
+
+def _load_value(value: Any) -> Any:
+    if isinstance(value, dict):
+        if "$oid" in value:
+            return ObjectId(value["$oid"])
+        if "$date" in value:
+            return datetime.fromisoformat(value["$date"])
+    return value
+
+
+def _sort_signature(sort: SortSpec) -> str:
+    return ",".join(f"{field}:{direction}" for field, direction in sort)
+
+
+def encode_cursor(doc: Dict[str, Any], sort: SortSpec) -> str:
+    """Build an opaque continuation token from the last document of a page."""
+    payload = {
+        "s": _sort_signature(sort),
+        "v": [_dump_value(doc.get(field)) for field, _ in sort],
+    }
+    raw = json.dumps(payload, separators=(",", ":")).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+
+def decode_cursor(token: str, sort: SortSpec) -> List[Any]:
+    """Decode a continuation token, rejecting tokens issued for another sort order."""
+    try:
+        raw = base64.urlsafe_b64decode(token + "=" * (-len(token) % 4))
+        payload = json.loads(raw)
+        values = [_load_value(v) for v in payload["v"]]
+    except (binascii.Error, ValueError, KeyError, TypeError):
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+
+    if payload.get("s") != _sort_signature(sort) or len(values) != len(sort):
+        raise HTTPException(status_code=400, detail="Cursor does not match the requested sort order")
+    return values
+
+
+def keyset_filter(sort: SortSpec, values: Sequence[Any]) -> Dict[str, Any]:
+    """Translate the last seen sort key into a Mongo filter for the next page.
+
+    For [("a", 1), ("_id", 1)] this yields
+    {"$or": [{"a": {"$gt": a}}, {"a": a, "_id": {"$gt": id}}]}.
+    """
+    clauses = []
+    for i, (field, direction) in enumerate(sort):
+        clause = {prev_field: prev_value for (prev_field, _), prev_value in zip(sort[:i], values[:i])}
+        clause[field] = {"$gt" if direction == 1 else "$lt": values[i]}
+        clauses.append(clause)
+    return clauses[0] if len(clauses) == 1 else {"$or": clauses}
+
+
+def build_projection(fields: str, allowed: Sequence[str], required: Sequence[str] = ()) -> Dict[str, int]:
+    """Parse a comma-separated `fields=` value into a Mongo projection."""
+    requested = [f.strip() for f in fields.split(",") if f.strip()]
+    unknown = sorted(set(requested) - set(allowed))
+    if unknown:
+        raise HTTPException(status_code=400, detail=f"Unknown fields: {', '.join(unknown)}")
+
+    projection = {field: 1 for field in requested}
+    for field in required:
+        projection[field] = 1
+    return projection
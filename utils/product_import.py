@@ -0,0 +1,193 @@
+import asyncio
+import csv
+import json
+import os
+from datetime import datetime
+from itertools import islice
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+from pydantic import ValidationError
+from pymongo import InsertOne, UpdateOne
+from pymongo.errors import BulkWriteError
+
+from config.db import import_jobs_collection, products_primary_collection
+from models.product import Product, ProductUpdate
+from utils.cache import catalog_cache
+from utils.search import build_search_index
+
+# Rows validated and written per bulk_write; bounds memory use of an import
+IMPORT_BATCH_SIZE = int(os.getenv("PRODUCT_IMPORT_BATCH_SIZE", "1000"))
+# Row errors kept on the job document
+MAX_REPORTED_ERRORS = 1000
+
+# CSV columns that map onto the nested `dimensions` object
+DIMENSION_COLUMNS = ("height", "width", "depth")
+
+_running = set()
+
+
+def _csv_record(row: Dict[str, str]) -> Dict[str, Any]:
+    """Turn a flat CSV row into the shape of the Product model."""
+    record: Dict[str, Any] = {k: v for k, v in row.items() if k and v not in ("", None)}
+    if "images" in record:
+        record["images"] = [url.strip() for url in record["images"].split("|") if url.strip()]
+    if any(column in record for column in DIMENSION_COLUMNS):
+        record["dimensions"] = {column: record.pop(column, None) for column in DIMENSION_COLUMNS}
+    return record
+
+
+def iter_records(path: str, file_format: str) -> Iterator[Tuple[int, Any]]:
+    """Yield (row number, record) pairs; unparseable lines yield the exception instead."""
+    with open(path, newline="", encoding="utf-8-sig") as f:
+        if file_format == "csv":
+            for number, row in enumerate(csv.DictReader(f), start=2):  # Row 1 is the header
+                yield number, _csv_record(row)
+        else:
+            for number, line in enumerate(f, start=1):
+                if not line.strip():
+                    continue
+                try:
+                    yield number, json.loads(line)
+                except ValueError as e:
+                    yield number, e
+
+
+def build_operation(record: Any, now: str) -> Tuple[Any, Optional[str], bool]:
+    """Validate one record and return (bulk_write operation, SKU, whether the row is partial).
+
+    Full rows are validated against Product and upserted by SKU (or inserted
+    when they have none). Only the row's own columns are $set on an existing
+    product; model defaults (e.g. empty `images`) apply to new ones only.
+    Rows with a SKU but only some fields are validated against ProductUpdate
+    and patch the existing product.
+    """
+    if isinstance(record, Exception):
+        raise ValueError(f"Malformed row: {record}")
+    if not isinstance(record, dict):
+        raise ValueError("Row must be an object")
+
+    defaults: Dict[str, Any] = {}
+    try:
+        product = Product.model_validate(record)
+        fields = product.model_dump(mode="json", exclude={"id"}, exclude_unset=True, exclude_none=True)
+        full = product.model_dump(mode="json", exclude={"id"}, exclude_none=True)
+        defaults = {k: v for k, v in full.items() if k not in fields}
+        partial = False
+    except ValidationError as e:
+        # Only rows that are merely incomplete count as partial updates
+        if not record.get("sku") or any(error["type"] != "missing" for error in e.errors()):
+            raise
+        fields = ProductUpdate.model_validate(record).model_dump(mode="json", exclude_none=True)
+        partial = True
+
+    for doc in (fields, defaults):
+        doc.pop("created_at", None)
+        doc.pop("updated_at", None)
+    fields["updated_at"] = now
+    sku = fields.get("sku")
+    if sku is None:
+        return InsertOne({**defaults, **fields, "created_at": now}), None, False
+    if partial:
+        return UpdateOne({"sku": sku}, {"$set": fields}), sku, True
+    operation = UpdateOne({"sku": sku}, {"$set": fields, "$setOnInsert": {**defaults, "created_at": now}}, upsert=True)
+    return operation, sku, False
+
+
+async def _missing_skus(skus: List[str]) -> set:
+    """SKUs among `skus` that no product has."""
+    if not skus:
+        return set()
+    found = await products_primary_collection.distinct("sku", {"sku": {"$in": skus}})
+    return set(skus) - set(found)
+
+
+async def _write_batch(job_id, batch: List[Tuple[int, Any]]):
+    now = datetime.utcnow().isoformat()
+    built, errors = [], []
+    for number, record in batch:
+        try:
+            built.append((number, *build_operation(record, now)))
+        except (ValidationError, ValueError) as e:
+            errors.append({"row": number, "error": str(e)})
+
+    # A partial row only patches; report it when its SKU exists nowhere, not even
+    # as a full row upserted earlier in this batch
+    unresolved, upserted = set(), set()
+    for _, _, sku, partial in built:
+        if partial and sku not in upserted:
+            unresolved.add(sku)
+        elif sku is not None and not partial:
+            upserted.add(sku)
+    missing = await _missing_skus(list(unresolved))
+
+    # Unordered writes may apply in any order, so rows touching a SKU that an earlier
+    # row of the batch also touches go into a later phase; file order then decides
+    phases: List[Tuple[list, list]] = []  # (operations, row numbers) per unordered bulk_write
+    phase_of: Dict[str, int] = {}
+    for number, operation, sku, partial in built:
+        if partial and sku in missing and sku not in phase_of:
+            errors.append({"row": number, "error": f"No product with SKU {sku!r} to update"})
+            continue
+        phase = phase_of[sku] + 1 if sku in phase_of else 0
+        if sku is not None:
+            phase_of[sku] = phase
+        if phase == len(phases):
+            phases.append(([], []))
+        phases[phase][0].append(operation)
+        phases[phase][1].append(number)
+
+    counts = {"inserted": 0, "upserted": 0, "updated": 0}
+    for operations, rows in phases:
+        try:
+            result = (await products_primary_collection.bulk_write(operations, ordered=False)).bulk_api_result
+        except BulkWriteError as e:
+            result = e.details
+            for write_error in result.get("writeErrors", []):
+                errors.append({"row": rows[write_error["index"]], "error": write_error.get("errmsg")})
+        counts["inserted"] += result.get("nInserted", 0)
+        counts["upserted"] += result.get("nUpserted", 0)
+        counts["updated"] += result.get("nMatched", 0)
+
+    await import_jobs_collection.update_one(
+        {"_id": job_id},
+        {
+            "$inc": {"processed": len(batch), "failed": len(errors), **counts},
+            "$push": {"errors": {"$each": errors, "$slice": MAX_REPORTED_ERRORS}},
+            "$set": {"updated_at": datetime.utcnow()},
+        },
+    )
+
+
+async def run_import(job_id, path: str, file_format: str):
+    """Stream a spooled upload into MongoDB in batches, recording progress on the job."""
+    await import_jobs_collection.update_one(
+        {"_id": job_id}, {"$set": {"status": "running", "started_at": datetime.utcnow()}}
+    )
+    try:
+        records = iter_records(path, file_format)
+        while True:
+            # File reading and parsing happen off the event loop
+            batch = await asyncio.to_thread(lambda: list(islice(records, IMPORT_BATCH_SIZE)))
+            if not batch:
+                break
+            await _write_batch(job_id, batch)
+        status, detail = "completed", None
+    except Exception as e:
+        # Whatever went wrong, the job must not stay "running" forever
+        status, detail = "failed", str(e)
+    finally:
+        os.unlink(path)
+        catalog_cache.invalidate("products")
+
+    await import_jobs_collection.update_one(
+        {"_id": job_id},
+        {"$set": {"status": status, "detail": detail, "finished_at": datetime.utcnow()}},
+    )
+    await build_search_index(products_primary_collection)  # Must include this import's writes
+
+
+def start_import(job_id, path: str, file_format: str):
+    """Run an import in the background of this worker."""
+    task = asyncio.create_task(run_import(job_id, path, file_format))
+    _running.add(task)
+    task.add_done_callback(_running.discard)
@@ -0,0 +1,219 @@
+import argparse
+import asyncio
+import sys
+from datetime import datetime, timedelta
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+from pymongo import UpdateOne
+
+from config.db import close_mongo_connection, connect_to_mongo, orders_collection, sales_rollups_collection
+
+# Statuses that count as sales in the analytics totals and top products
+SALES_STATUSES = ["pending", "shipped", "delivered"]
+
+# ------------------------------
+# Incremental Updates
+# ------------------------------
+
+# Each order adds to one "day" row (orders, revenue, items) for its creation day
+# and status, and to one "product" row (quantity, revenue) per line item. A status
+# move subtracts from the old status' rows and adds to the new status' rows.
+
+RollupKey = Tuple[str, datetime, str, Optional[str]]
+
+
+def day_of(moment: datetime) -> datetime:
+    return datetime(moment.year, moment.month, moment.day)
+
+
+def week_of(day: datetime) -> datetime:
+    """Monday of the ISO week containing `day`."""
+    return day - timedelta(days=day.weekday())
+
+
+def _add(increments: Dict[RollupKey, Dict[str, Any]], key: RollupKey, values: Dict[str, float], name=None):
+    row = increments.setdefault(key, {"inc": {}, "name": None})
+    for field, value in values.items():
+        row["inc"][field] = row["inc"].get(field, 0) + value
+    if name is not None:
+        row["name"] = name
+
+
+def collect_increments(changes: Iterable[Tuple[dict, str, int]]) -> Dict[RollupKey, Dict[str, Any]]:
+    """Merge (order, status, +1/-1) contributions into one increment per rollup row."""
+    increments: Dict[RollupKey, Dict[str, Any]] = {}
+    for order, status, sign in changes:
+        day = day_of(order["created_at"])
+        items = order.get("items", [])
+        _add(increments, ("day", day, status, None), {
+            "orders": sign,
+            "revenue": sign * order["total_price"],
+            "items": sign * sum(item["quantity"] for item in items),
+        })
+        for item in items:
+            _add(increments, ("product", day, status, item["product_id"]), {
+                "quantity": sign * item["quantity"],
+                "revenue": sign * item["price"] * item["quantity"],
+            }, name=item.get("name"))
+    return increments
+
+
+def rollup_operations(changes: Iterable[Tuple[dict, str, int]]) -> List[UpdateOne]:
+    operations = []
+    for (kind, day, status, product_id), row in collect_increments(changes).items():
+        inc = {field: value for field, value in row["inc"].items() if value}
+        if not inc:
+            continue  # Contributions cancelled out
+        update: Dict[str, Any] = {"$inc": inc}
+        if row["name"] is not None:
+            update["$set"] = {"name": row["name"]}
+        operations.append(UpdateOne(
+            {"kind": kind, "day": day, "status": status, "product_id": product_id}, update, upsert=True
+        ))
+    return operations
+
+
+async def record_orders(changes: Iterable[Tuple[dict, str, int]], session=None):
+    """Apply rollup increments for (order, status, sign) contributions in one bulk_write.
+
+    Orders need `created_at`, `total_price` and `items`.
+    """
+    operations = rollup_operations(changes)
+    if operations:
+        await sales_rollups_collection.bulk_write(operations, ordered=False, session=session)
+
+
+async def record_status_changes(orders: Iterable[dict], new_status: str, session=None):
+    """Move orders (as they were before the update) from their old status to `new_status`."""
+    changes = []
+    for order in orders:
+        if order["status"] != new_status:
+            changes.append((order, order["status"], -1))
+            changes.append((order, new_status, 1))
+    await record_orders(changes, session=session)
+
+
+# ------------------------------
+# Queries
+# ------------------------------
+
+async def sales_summary(start: datetime, end: datetime, interval: str, top: int) -> Dict[str, Any]:
+    """Sales per day/week, a status breakdown and top products between start and end."""
+    day_range = {"$gte": day_of(start), "$lt": end}
+    bucket_of = week_of if interval == "week" else (lambda day: day)
+
+    series: Dict[datetime, Dict[str, Any]] = {}
+    breakdown: Dict[str, Dict[str, float]] = {}
+    async for row in sales_rollups_collection.find({"kind": "day", "day": day_range}):
+        period = series.setdefault(bucket_of(row["day"]), {"orders": 0, "revenue": 0.0, "items": 0, "by_status": {}})
+        status = period["by_status"].setdefault(row["status"], {"orders": 0, "revenue": 0.0})
+        status["orders"] += row.get("orders", 0)
+        status["revenue"] += row.get("revenue", 0)
+        if row["status"] in SALES_STATUSES:
+            period["orders"] += row.get("orders", 0)
+            period["revenue"] += row.get("revenue", 0)
+            period["items"] += row.get("items", 0)
+        total = breakdown.setdefault(row["status"], {"orders": 0, "revenue": 0.0})
+        total["orders"] += row.get("orders", 0)
+        total["revenue"] += row.get("revenue", 0)
+
+    ranking = [
+        {"$match": {"kind": "product", "day": day_range, "status": {"$in": SALES_STATUSES}}},
+        {"$group": {
+            "_id": "$product_id",
+            "name": {"$last": "$name"},
+            "quantity": {"$sum": "$quantity"},
+            "revenue": {"$sum": "$revenue"},
+        }},
+        {"$facet": {
+            "by_quantity": [{"$sort": {"quantity": -1, "_id": 1}}, {"$limit": top}],
+            "by_revenue": [{"$sort": {"revenue": -1, "_id": 1}}, {"$limit": top}],
+        }},
+    ]
+    top_products = (await sales_rollups_collection.aggregate(ranking).to_list(None))[0]
+
+    def product(row):
+        return {
+            "product_id": row["_id"],
+            "name": row.get("name"),
+            "quantity": row["quantity"],
+            "revenue": round(row["revenue"], 2),
+        }
+
+    return {
+        "interval": interval,
+        "start": day_of(start),
+        "end": end,
+        "series": [
+            {"period": period, **values, "revenue": round(values["revenue"], 2)}
+            for period, values in sorted(series.items())
+        ],
+        "status_breakdown": {status: {**v, "revenue": round(v["revenue"], 2)} for status, v in breakdown.items()},
+        "top_products": {key: [product(row) for row in rows] for key, rows in top_products.items()},
+    }
+
+
+# ------------------------------
+# Rebuild
+# ------------------------------
+
+ORDER_DAY = {"$dateFromParts": {
+    "year": {"$year": "$created_at"},
+    "month": {"$month": "$created_at"},
+    "day": {"$dayOfMonth": "$created_at"},
+}}
+
+# One pipeline over `orders`: day rows, then product rows via $unionWith, written with $out
+REBUILD_PIPELINE = [
+    {"$group": {
+        "_id": {"day": ORDER_DAY, "status": "$status"},
+        "orders": {"$sum": 1},
+        "revenue": {"$sum": "$total_price"},
+        "items": {"$sum": {"$sum": "$items.quantity"}},
+    }},
+    {"$project": {
+        "_id": 0, "kind": {"$literal": "day"}, "day": "$_id.day", "status": "$_id.status",
+        "product_id": {"$literal": None},
+        "orders": 1, "revenue": 1, "items": 1,
+    }},
+    {"$unionWith": {"coll": "orders", "pipeline": [
+        {"$unwind": "$items"},
+        {"$group": {
+            "_id": {"day": ORDER_DAY, "status": "$status", "product_id": "$items.product_id"},
+            "name": {"$last": "$items.name"},
+            "quantity": {"$sum": "$items.quantity"},
+            "revenue": {"$sum": {"$multiply": ["$items.price", "$items.quantity"]}},
+        }},
+        {"$project": {
+            "_id": 0, "kind": {"$literal": "product"}, "day": "$_id.day", "status": "$_id.status",
+            "product_id": "$_id.product_id", "name": 1, "quantity": 1, "revenue": 1,
+        }},
+    ]}},
+    # Replaces the collection atomically when the pipeline finishes; existing indexes are kept
+    {"$out": "sales_rollups"},
+]
+
+
+async def rebuild_rollups():
+    """Recompute every rollup row from `orders` (`python -m utils.sales_rollups`).
+
+    Orders written while the pipeline runs may be missed; run it when order
+    traffic is quiet (or again afterwards) to repair any drift.
+    """
+    await orders_collection.aggregate(REBUILD_PIPELINE, allowDiskUse=True).to_list(None)
+    return await sales_rollups_collection.count_documents({})
+
+
+async def _main(args):
+    await connect_to_mongo()
+    try:
+        rows = await rebuild_rollups()
+        print(f"✅ Rebuilt sales rollups: {rows} rows")
+        return 0
+    finally:
+        await close_mongo_connection()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Rebuild the sales_rollups collection from orders")
+    sys.exit(asyncio.run(_main(parser.parse_args())))
@@ -0,0 +1,189 @@
+import bisect
+import heapq
+import re
+from collections import Counter
+from typing import Any, Dict, Iterable, List, Optional, Set
+
+# Relative importance of a term depending on the field it came from
+FIELD_WEIGHTS = {"name": 3.0, "brand": 2.0, "category": 2.0, "description": 1.0}
+# A prefix match on the last (still being typed) word scores less than a full word
+PREFIX_FACTOR = 0.5
+# Upper bound on vocabulary terms one prefix may expand to
+MAX_PREFIX_EXPANSIONS = 64
+# Price facet buckets as [low, high); None means unbounded
+PRICE_BUCKETS = [(0, 500), (500, 1000), (1000, 5000), (5000, 20000), (20000, None)]
+
+TOKEN_RE = re.compile(r"[a-z0-9]+")
+
+# Fields kept per product to render a search result without hitting MongoDB
+SUMMARY_FIELDS = ("name", "price", "brand", "category", "quantity")
+
+
+def tokenize(text: Optional[str]) -> List[str]:
+    return TOKEN_RE.findall(text.lower()) if text else []
+
+
+def price_bucket(price: Optional[float]) -> Optional[str]:
+    if price is None:
+        return None
+    for low, high in PRICE_BUCKETS:
+        if price >= low and (high is None or price < high):
+            return f"{low}-{high}" if high is not None else f"{low}+"
+    return None
+
+
+class ProductSearchIndex:
+    """Inverted index over product name, description, brand and category.
+
+    Postings map each term to {product_id: weight}. The sorted vocabulary
+    used for prefix lookups is rebuilt lazily after the index changes.
+    """
+
+    def __init__(self):
+        self.postings: Dict[str, Dict[str, float]] = {}
+        self.products: Dict[str, Dict[str, Any]] = {}
+        self._doc_terms: Dict[str, Set[str]] = {}
+        self._vocabulary: List[str] = []
+        self._vocabulary_dirty = False
+
+    def build(self, docs: Iterable[dict]):
+        self.postings.clear()
+        self.products.clear()
+        self._doc_terms.clear()
+        # The old vocabulary may name terms that no longer have postings
+        self._vocabulary = []
+        self._vocabulary_dirty = True
+        for doc in docs:
+            self.add(doc)
+
+    def add(self, doc: dict):
+        """Index a product document, replacing any previous version of it."""
+        product_id = str(doc["_id"])
+        self.remove(product_id)
+
+        weights: Dict[str, float] = {}
+        for field, weight in FIELD_WEIGHTS.items():
+            for term in tokenize(doc.get(field)):
+                weights[term] = weights.get(term, 0.0) + weight
+
+        for term, weight in weights.items():
+            if term not in self.postings:
+                self.postings[term] = {}
+                self._vocabulary_dirty = True
+            self.postings[term][product_id] = weight
+
+        self._doc_terms[product_id] = set(weights)
+        images = doc.get("images") or []
+        self.products[product_id] = {
+            "_id": product_id,
+            **{field: doc.get(field) for field in SUMMARY_FIELDS},
+            "image": str(images[0]) if images else None,
+        }
+
+    def remove(self, product_id: Any):
+        product_id = str(product_id)
+        for term in self._doc_terms.pop(product_id, ()):
+            postings = self.postings[term]
+            postings.pop(product_id, None)
+            if not postings:
+                del self.postings[term]
+                self._vocabulary_dirty = True
+        self.products.pop(product_id, None)
+
+    def on_change(self, operation: str, payload: Any):
+        """Listener for catalog snapshot changes."""
+        if operation == "upsert":
+            self.add(payload)
+        elif operation == "delete":
+            self.remove(payload)
+        elif operation == "reload":
+            self.build(payload)
+
+    def _prefix_terms(self, prefix: str) -> List[str]:
+        if self._vocabulary_dirty:
+            self._vocabulary = sorted(self.postings)
+            self._vocabulary_dirty = False
+        start = bisect.bisect_left(self._vocabulary, prefix)
+        terms = []
+        for term in self._vocabulary[start:start + MAX_PREFIX_EXPANSIONS]:
+            if not term.startswith(prefix):
+                break
+            terms.append(term)
+        return terms
+
+    def _match(self, terms: List[str]) -> Optional[Dict[str, float]]:
+        """Score products containing every query term; the last one matches as a prefix."""
+        scores: Optional[Dict[str, float]] = None
+        for i, term in enumerate(terms):
+            term_scores: Dict[str, float] = dict(self.postings.get(term, {}))
+            if i == len(terms) - 1:
+                for expansion in self._prefix_terms(term):
+                    if expansion == term:
+                        continue
+                    for product_id, weight in self.postings[expansion].items():
+                        term_scores[product_id] = max(term_scores.get(product_id, 0.0), weight * PREFIX_FACTOR)
+            if scores is None:
+                scores = term_scores
+            else:
+                scores = {pid: score + term_scores[pid] for pid, score in scores.items() if pid in term_scores}
+            if not scores:
+                return {}
+        return scores
+
+    def search(
+        self,
+        query: str = "",
+        category: Optional[str] = None,
+        brand: Optional[str] = None,
+        min_price: Optional[float] = None,
+        max_price: Optional[float] = None,
+        limit: int = 10,
+    ) -> Dict[str, Any]:
+        """Return the top `limit` matches plus category, brand and price facet counts."""
+        terms = tokenize(query)
+        scores = self._match(terms) if terms else {pid: 0.0 for pid in self.products}
+
+        matches = []
+        for product_id in scores:
+            product = self.products[product_id]
+            price = product.get("price")
+            if category and product.get("category") != category:
+                continue
+            if brand and product.get("brand") != brand:
+                continue
+            if min_price is not None and (price is None or price < min_price):
+                continue
+            if max_price is not None and (price is None or price > max_price):
+                continue
+            matches.append(product)
+
+        facets = {
+            "category": Counter(p["category"] for p in matches if p.get("category")),
+            "brand": Counter(p["brand"] for p in matches if p.get("brand")),
+            "price": Counter(b for b in (price_bucket(p.get("price")) for p in matches) if b),
+        }
+        top = heapq.nlargest(
+            limit, matches, key=lambda p: (scores[p["_id"]], -len(p.get("name") or ""))
+        )
+        return {
+            "total": len(matches),
+            "results": [{**p, "score": scores[p["_id"]]} for p in top],
+            "facets": {name: dict(counts.most_common()) for name, counts in facets.items()},
+        }
+
+
+search_index = ProductSearchIndex()
+
+
+INDEX_PROJECTION = {field: 1 for field in (*FIELD_WEIGHTS, *SUMMARY_FIELDS, "images")}
+
+
+async def build_search_index(collection):
+    """Load every product into the search index (called at startup)."""
+    search_index.build([doc async for doc in collection.find({}, INDEX_PROJECTION)])
+
+
+async def refresh_search_index(collection, product_ids: Iterable[Any]):
+    """Re-index a few products after a write that changed them in MongoDB (e.g. stock)."""
+    async for doc in collection.find({"_id": {"$in": list(product_ids)}}, INDEX_PROJECTION):
+        search_index.add(doc)
@@ -0,0 +1,42 @@
+import base64
+from typing import Any
+
+import orjson
+from bson import Decimal128, ObjectId
+from fastapi.responses import Response
+
+
+def json_default(value: Any) -> Any:
+    """Encode the BSON types orjson does not know (datetime is handled natively).
+
+    Anything else (Decimal128, Binary, ...) falls back to str(), as the old
+    jsonable_encoder path did: raising here would abort a streamed export
+    after its 200 status has already been sent.
+    """
+    if isinstance(value, ObjectId):
+        return str(value)
+    if isinstance(value, Decimal128):
+        return str(value.to_decimal())
+    if isinstance(value, bytes):  # Including bson.Binary
+        return base64.b64encode(value).decode()
+    return str(value)
+
+
+def dumps(value: Any) -> bytes:
+    """Serialize database documents to compact JSON bytes."""
+    return orjson.dumps(value, default=json_default)
+
+
+class FastJSONResponse(Response):
+    """JSON response for raw Motor documents.
+
+    ObjectId and datetime are encoded directly, so handlers can return what
+    the driver gave them without rebuilding each document. Returning a
+    Response also skips FastAPI's response_model revalidation, so only use
+    it for trusted database reads.
+    """
+
+    media_type = "application/json"
+
+    def render(self, content: Any) -> bytes:
+        return dumps(content)
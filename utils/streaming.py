@@ -0,0 +1,58 @@
+import csv
+import io
+from typing import Any, AsyncIterator, Callable, Dict, Sequence
+
+from utils.serialization import dumps
+
+# Number of serialized documents buffered before a chunk is handed to the server
+STREAM_CHUNK_SIZE = 100
+
+
+async def ndjson_stream(
+    cursor, transform: Callable[[Dict[str, Any]], Dict[str, Any]]
+) -> AsyncIterator[bytes]:
+    """Serialize a Motor cursor as newline-delimited JSON, one small chunk at a time."""
+    buffer = []
+    async for doc in cursor:
+        buffer.append(dumps(transform(doc)))
+        if len(buffer) >= STREAM_CHUNK_SIZE:
+            yield b"\n".join(buffer) + b"\n"
+            buffer.clear()
+    if buffer:
+        yield b"\n".join(buffer) + b"\n"
+
+
+async def json_array_stream(
+    cursor, transform: Callable[[Dict[str, Any]], Dict[str, Any]]
+) -> AsyncIterator[bytes]:
+    """Serialize a Motor cursor as a single JSON array without materializing it."""
+    yield b"["
+    first = True
+    buffer = []
+    async for doc in cursor:
+        buffer.append((b"" if first else b",") + dumps(transform(doc)))
+        first = False
+        if len(buffer) >= STREAM_CHUNK_SIZE:
+            yield b"".join(buffer)
+            buffer.clear()
+    buffer.append(b"]")
+    yield b"".join(buffer)
+
+
+async def csv_stream(
+    cursor, columns: Sequence[str], transform: Callable[[Dict[str, Any]], Dict[str, Any]]
+) -> AsyncIterator[bytes]:
+    """Serialize a Motor cursor as CSV with a header row."""
+    out = io.StringIO()
+    writer = csv.DictWriter(out, fieldnames=columns, extrasaction="ignore")
+    writer.writeheader()
+    count = 0
+    async for doc in cursor:
+        writer.writerow(transform(doc))
+        count += 1
+        if count % STREAM_CHUNK_SIZE == 0:
+            yield out.getvalue().encode()
+            out.seek(0)
+            out.truncate()
+    if out.tell():
+        yield out.getvalue().encode()